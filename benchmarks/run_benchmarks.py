@@ -0,0 +1,165 @@
+"""
+Benchmarks the CodeDoc tools against a synthetic project.
+
+Every case runs in its own interpreter, so peak RSS belongs to that tool alone.
+The first call is timed cold: no in-memory index and no ``.codedoc/`` cache.
+The following calls are timed warm. Before each warm call the benchmark waits
+out the windows in which the in-memory indexes are trusted without looking at
+the disk, so warm calls pay for the same re-checks a later real call would.
+Results are written as JSON so runs can be diffed over time.
+
+    python benchmarks/synthetic_repo.py /tmp/bench-10k --files 10000
+    python benchmarks/run_benchmarks.py /tmp/bench-10k --out results/10k.json
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from synthetic_repo import MANIFEST  # noqa: E402
+
+# name -> (tool, kwargs, needs git)
+CASES = {
+    "scan_project_files": ("scan_project_files", {}, False),
+    "predict_impact": ("predict_impact", {"file_path": "shared.ts", "symbol": "fetchData"}, False),
+    "global_security_audit": ("global_security_audit", {}, False),
+    "global_security_audit_parallel": ("global_security_audit", {"workers": 0}, False),
+    "guardian_scan": ("guardian_scan", {}, False),
+    "guardian_scan_diff": ("guardian_scan", {"scan_uncommitted": True, "diff_only": True}, True),
+    "heal_dependency_calls": ("heal_dependency_calls", {"symbol_name": "parseConfig", "file_path": "shared.ts", "change_type": "RENAME"}, False),
+    "inspect_contract_change": ("inspect_contract_change", {}, True),
+}
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+def count_files(root: str) -> int:
+    total = 0
+    for _, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        total += len(files)
+    return total
+
+
+def trust_window() -> float:
+    """Longest time an in-memory index answers without re-checking the disk."""
+    from codedoc.depgraph import GRAPH_SYNC_INTERVAL
+    from codedoc.index import REFRESH_INTERVAL
+    from codedoc.symbols import SYNC_INTERVAL
+    return max(REFRESH_INTERVAL, SYNC_INTERVAL, GRAPH_SYNC_INTERVAL)
+
+
+def run_case(name: str, repo: str, repeat: int, settle: float) -> dict:
+    """Child side: times one case ``repeat`` times inside this process, ``settle`` seconds apart."""
+    shutil.rmtree(os.path.join(repo, ".codedoc"), ignore_errors=True)
+    os.chdir(repo)
+    from codedoc import server
+
+    tool_name, kwargs, _ = CASES[name]
+    tool = getattr(server, tool_name)
+    runs = []
+    for n in range(repeat):
+        if n:
+            time.sleep(settle)
+        start = time.perf_counter()
+        result = tool(**kwargs)
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        runs.append(time.perf_counter() - start)
+    return {"runs": runs, "peak_rss_mb": round(peak_rss_mb(), 1), "output_chars": len(str(result))}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CodeDoc tools on a synthetic project.")
+    parser.add_argument("repo", help="Tree created by synthetic_repo.py")
+    parser.add_argument("--cases", nargs="*", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="Calls per case (first one is cold).")
+    parser.add_argument("--settle", type=float, help="Seconds between calls (default: just past the index trust windows).")
+    parser.add_argument("--out", help="Write the JSON report here (default: stdout only).")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    repo = os.path.abspath(args.repo)
+    settle = args.settle if args.settle is not None else trust_window() + 0.1
+
+    if args.child:
+        print(json.dumps(run_case(args.child, repo, args.repeat, settle)))
+        return
+
+    try:
+        with open(os.path.join(repo, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except OSError:
+        manifest = {}
+    files = count_files(repo)
+    is_git = os.path.isdir(os.path.join(repo, ".git"))
+
+    results = []
+    for name in args.cases:
+        if CASES[name][2] and not is_git:
+            print(f"skip {name}: {repo} is not a git repository", file=sys.stderr)
+            continue
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), repo, "--child", name, "--repeat", str(args.repeat), "--settle", str(settle)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"FAIL {name}:\n{proc.stderr}", file=sys.stderr)
+            results.append({"case": name, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        data = json.loads(proc.stdout.strip().splitlines()[-1])
+        runs = data["runs"]
+        warm = sorted(runs[1:])[len(runs[1:]) // 2] if len(runs) > 1 else None
+        results.append({
+            "case": name,
+            "cold_s": round(runs[0], 4),
+            "warm_s": round(warm, 4) if warm is not None else None,
+            "runs_s": [round(r, 4) for r in runs],
+            "files_per_s_cold": round(files / runs[0]) if runs[0] else None,
+            "files_per_s_warm": round(files / warm) if warm else None,
+            "peak_rss_mb": data["peak_rss_mb"],
+            "output_chars": data["output_chars"],
+        })
+        print(f"{name:32} cold {runs[0]:8.3f}s  warm {warm or 0:8.3f}s  rss {data['peak_rss_mb']:7.1f} MB", file=sys.stderr)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "codedoc_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repo": {"path": repo, "files_on_disk": files, **manifest},
+        "repeat": args.repeat,
+        "settle_s": settle,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
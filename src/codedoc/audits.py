@@ -0,0 +1,117 @@
+"""
+Memory of previous health audits for delta re-audits.
+
+``evaluate_and_refactor`` remembers the exact text it sent for each file, and
+``record_audit_report`` attaches the resulting health report. When a file is
+audited again with ``delta=True``, only the changed regions are sent,
+together with that report, instead of the whole file.
+
+Entries are kept in least-recently-used order and bounded both by count and
+by total size.
+"""
+import difflib
+import threading
+from collections import OrderedDict
+
+# Files remembered at most / total characters of remembered text.
+MAX_AUDITED_FILES = 64
+MAX_AUDIT_CHARS = 16 << 20
+
+# Unchanged lines shown around each changed region.
+DELTA_CONTEXT = 3
+
+# Above this share of changed lines a delta is no cheaper than a full audit.
+MAX_DELTA_RATIO = 0.5
+
+
+class AuditEntry:
+    """
+    - sent: text of the last version sent for audit
+    - base: text the recorded ``report`` refers to (None until a report is recorded)
+    """
+
+    def __init__(self, sent: str):
+        self.sent = sent
+        self.base = None
+        self.report = None
+
+    @property
+    def size(self) -> int:
+        return len(self.sent) + len(self.base or "") + len(self.report or "")
+
+
+class AuditCache:
+    def __init__(self, max_files: int = MAX_AUDITED_FILES, max_chars: int = MAX_AUDIT_CHARS):
+        self.max_files = max_files
+        self.max_chars = max_chars
+        self._entries = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_files or self._chars > self.max_chars):
+            _, entry = self._entries.popitem(last=False)
+            self._chars -= entry.size
+
+    def get(self, path: str):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+            return entry
+
+    def remember(self, path: str, text: str):
+        """Records ``text`` as the version of ``path`` just sent for audit."""
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is None:
+                entry = AuditEntry(text)
+            else:
+                self._chars -= entry.size
+                entry.sent = text
+            self._entries[path] = entry
+            self._chars += entry.size
+            self._evict()
+
+    def record_report(self, path: str, report: str) -> bool:
+        """Attaches the health report of the last version sent; False if the file is not remembered."""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return False
+            self._chars -= entry.size
+            entry.base, entry.report = entry.sent, report
+            self._chars += entry.size
+            self._entries.move_to_end(path)
+            self._evict()
+            return True
+
+
+AUDITS = AuditCache()
+
+
+def changed_regions(old: str, new: str, context: int = DELTA_CONTEXT) -> tuple:
+    """
+    Returns (rendered regions, changed line count of the new text).
+    Regions are numbered by new-file lines; '-' lines show what was removed.
+    """
+    old_lines, new_lines = old.split("\n"), new.split("\n")
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    parts, changed = [], 0
+    for group in matcher.get_grouped_opcodes(context):
+        first, last = group[0], group[-1]
+        lines = [f"@@ new L{first[3] + 1}-{last[4]} (was L{first[1] + 1}-{last[2]}) @@"]
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                lines += [f"  {j + 1:>5} | {new_lines[j]}" for j in range(j1, j2)]
+                continue
+            lines += [f"- {'':>5} | {old_lines[i]}" for i in range(i1, i2)]
+            lines += [f"+ {j + 1:>5} | {new_lines[j]}" for j in range(j1, j2)]
+            changed += max(i2 - i1, j2 - j1)
+        parts.append("\n".join(lines))
+    return "\n\n".join(parts), changed
+
+
+def worth_delta(changed: int, text: str, max_ratio: float = MAX_DELTA_RATIO) -> bool:
+    """True when ``changed`` lines are a small enough share of ``text`` for a delta audit."""
+    return changed <= max_ratio * max(text.count("\n") + 1, 1)
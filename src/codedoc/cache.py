@@ -0,0 +1,195 @@
+"""
+On-disk findings cache for the security scanners.
+
+Each scanned file's findings are stored under ``<project>/.codedoc/`` in one
+SQLite database per rule set, keyed by path with size, mtime and content hash.
+An unchanged file costs one ``stat``; a touched-but-identical file costs one
+hash; only real edits are rescanned, and hashed from the same read. Only the
+rows that changed are written back after a scan.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from codedoc.flight import FLIGHTS
+from codedoc.jobs import poll
+from codedoc.scanner import RuleEngine, scan_files
+from codedoc.stats import count
+
+CACHE_DIR = ".codedoc"
+
+# Upper bound of cached files per rule set; least recently used entries go first.
+# A scan larger than this raises the bound to its own size, so a full scan never evicts itself.
+MAX_ENTRIES = 250_000
+
+
+def cache_dir(root: str) -> str:
+    """Returns ``<root>/.codedoc``, creating it (git-ignored) on first use."""
+    path = os.path.join(root, CACHE_DIR)
+    if not os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ".gitignore"), "w", encoding="utf-8") as f:
+            f.write("*\n")
+    return path
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Writes JSON through a temp file + os.replace so readers never see half a file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FindingsCache:
+    """
+    Per-file findings of one rule set.
+    Entries are ``abs_path -> [size, mtime_ns, sha1, [[line, rule], ...]]``
+    kept in least-recently-used order (sha1 is None for binaries).
+    - _pending: abs_path -> entry to upsert, or None to delete, on the next ``save()``
+    """
+
+    def __init__(self, root: str, engine: RuleEngine, max_entries: int = MAX_ENTRIES):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.path = os.path.join(root, CACHE_DIR, f"findings-{engine.fingerprint[:12]}.sqlite")
+        self.root = root
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("CREATE TABLE IF NOT EXISTS entries (path TEXT PRIMARY KEY, size INTEGER, "
+                   "mtime_ns INTEGER, sha1 TEXT, findings TEXT)")
+        return db
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            db = self._connect()
+            try:
+                # Rows are re-inserted when written, so rowid order is roughly least recent first
+                rows = db.execute("SELECT path, size, mtime_ns, sha1, findings FROM entries ORDER BY rowid").fetchall()
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return
+        self._entries = OrderedDict((path, [size, mtime, sha1, json.loads(findings)])
+                                    for path, size, mtime, sha1, findings in rows)
+
+    def save(self):
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            upserts = [(path, e[0], e[1], e[2], json.dumps(e[3])) for path, e in pending.items() if e is not None]
+            deletes = [(path,) for path, e in pending.items() if e is None]
+            try:
+                cache_dir(self.root)
+                db = self._connect()
+                try:
+                    with db:
+                        db.executemany("DELETE FROM entries WHERE path = ?", deletes)
+                        db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", upserts)
+                finally:
+                    db.close()
+            except (OSError, sqlite3.Error):
+                pass  # a read-only checkout simply runs uncached next time
+
+    def _cached(self, path: str, st):
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != st.st_size:
+            return None
+        if entry[1] != st.st_mtime_ns:
+            # Touched (checkout, rebase, formatter...) but maybe not changed
+            if entry[2] is None:
+                return None  # binary: re-sniffing is as cheap as hashing
+            try:
+                if file_digest(path) != entry[2]:
+                    return None
+            except OSError:
+                return None
+            entry[1] = st.st_mtime_ns
+            self._pending[path] = entry
+        self._entries.move_to_end(path)
+        return [tuple(f) for f in entry[3]]
+
+    def scan(self, paths: list, workers: int = 1, job=None) -> tuple:
+        """
+        Returns (findings per path in input order, hits, misses).
+        Only cache misses are scanned, serially or across ``workers`` processes.
+        Identical concurrent scans (same rule set and paths) share one run.
+        """
+        key = ("scan", self.path, hashlib.sha1("\0".join(paths).encode("utf-8", "surrogateescape")).hexdigest())
+        return FLIGHTS.do(key, lambda: self._scan(paths, workers, job), job=job)
+
+    def _scan(self, paths: list, workers: int = 1, job=None) -> tuple:
+        results = [None] * len(paths)
+        misses = []
+        hits = 0
+        with self._lock:
+            for i, path in enumerate(paths):
+                if i % 1024 == 0:
+                    poll(job)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    results[i] = []
+                    continue
+                cached = self._cached(path, st)
+                if cached is None:
+                    misses.append((i, path, st))
+                else:
+                    results[i] = cached
+                    hits += 1
+
+        count("cache_hits", hits)
+        count("cache_misses", len(misses))
+        count("files_scanned", len(misses))
+        count("bytes_scanned", sum(st.st_size for _, _, st in misses))
+        start = time.perf_counter()
+        scanned = scan_files(self.engine, [path for _, path, _ in misses], workers, job, digest=True)
+        count("scan_s", time.perf_counter() - start)
+
+        with self._lock:
+            for (i, path, st), (findings, digest) in zip(misses, scanned):
+                results[i] = findings
+                entry = [st.st_size, st.st_mtime_ns, digest, [list(f) for f in findings]]
+                self._entries[path] = self._pending[path] = entry
+                self._entries.move_to_end(path)
+            # Everything this scan touched is most recent: only older entries are evicted
+            while len(self._entries) > max(self.max_entries, len(paths)):
+                evicted, _ = self._entries.popitem(last=False)
+                self._pending[evicted] = None
+
+        self.save()
+        return results, hits, len(misses)
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_findings_cache(root: str, engine: RuleEngine) -> FindingsCache:
+    """Returns the shared findings cache of ``engine`` under ``root``."""
+    key = (os.path.abspath(root), engine.fingerprint)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = FindingsCache(key[0], engine)
+    return cache
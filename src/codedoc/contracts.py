@@ -0,0 +1,178 @@
+"""
+Per-file declaration tables for contract-change detection.
+
+A declaration table maps every class/function/method of a file to its kind
+and parameter names. Tables are cached by git blob hash, so the HEAD side of
+a file is parsed once no matter how often the tool runs, and comparing the
+HEAD and working-tree tables tells renames and parameter changes apart.
+"""
+import ast
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from codedoc.slicing import brace_units
+
+# One declaration: kind ('class', 'def', 'function', 'method', ...), parameter names, 1-based line.
+Decl = namedtuple("Decl", "kind params line")
+
+# Extensions that have a declaration parser.
+CONTRACT_EXTS = ('.py', '.ts', '.tsx', '.js', '.jsx', '.java', '.cs')
+
+# Declaration tables kept in memory (keyed by blob hash).
+MAX_TABLES = 2048
+
+_IDENT = re.compile(r"[A-Za-z_$][\w$]*")
+
+
+def blob_hash(data: bytes) -> str:
+    """Git's object id for ``data`` (what ``git hash-object`` prints)."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def python_table(text: str) -> dict:
+    table = {}
+
+    def visit(body, prefix):
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                table[prefix + node.name] = Decl("class", (), node.lineno)
+                visit(node.body, f"{prefix}{node.name}.")
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                args = node.args
+                names = [a.arg for a in args.posonlyargs + args.args]
+                if args.vararg:
+                    names.append("*" + args.vararg.arg)
+                names += [a.arg for a in args.kwonlyargs]
+                if args.kwarg:
+                    names.append("**" + args.kwarg.arg)
+                table[prefix + node.name] = Decl("def", tuple(n for n in names if n not in ("self", "cls")), node.lineno)
+
+    visit(ast.parse(text).body, "")
+    return table
+
+
+def _split_params(text: str) -> list:
+    """Splits a parameter list on top-level commas."""
+    parts, depth, current = [], 0, []
+    for ch in text:
+        if ch in "([{<":
+            depth += 1
+        elif ch in ")]}>":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _param_name(param: str) -> str:
+    """'name?: string = 1' -> 'name'; 'final List<String> items' -> 'items'."""
+    param = param.split("=", 1)[0].strip()
+    if ":" in param:
+        return param.split(":", 1)[0].strip().rstrip("?").lstrip(".")
+    idents = _IDENT.findall(param)
+    return idents[-1] if idents else param
+
+
+def brace_table(text: str) -> dict:
+    """Declarations of TS/JS/Java/C# files, reusing the brace-based splitter."""
+    table = {}
+    lines = text.split("\n")
+    for unit in brace_units(text):
+        if unit.kind not in ("function", "method"):
+            table[unit.name] = Decl(unit.kind, (), unit.start)
+            continue
+        header = "\n".join(lines[unit.start - 1:unit.end])
+        short_name = unit.name.rsplit(".", 1)[-1]
+        open_at = header.find("(", max(header.find(short_name), 0))
+        params = ()
+        if open_at != -1:
+            depth = 0
+            for close_at in range(open_at, len(header)):
+                depth += {"(": 1, ")": -1}.get(header[close_at], 0)
+                if depth == 0:
+                    params = tuple(_param_name(p) for p in _split_params(header[open_at + 1:close_at]))
+                    break
+        table[unit.name] = Decl(unit.kind, params, unit.start)
+    return table
+
+
+def declaration_table(path: str, text: str) -> dict:
+    """Declaration table of one file version; an unparsable file yields an empty table."""
+    try:
+        return python_table(text) if path.endswith(".py") else brace_table(text)
+    except (SyntaxError, ValueError):
+        return {}
+
+
+class TableCache:
+    """LRU of declaration tables keyed by (blob hash, extension)."""
+
+    def __init__(self, max_entries: int = MAX_TABLES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, blob: str, path: str):
+        key = (blob, path.rsplit(".", 1)[-1])
+        with self._lock:
+            table = self._entries.get(key)
+            if table is not None:
+                self._entries.move_to_end(key)
+            return table
+
+    def table(self, blob: str, path: str, text: str) -> dict:
+        """Cached table of ``blob``, parsed from ``text`` on a miss (``text`` must be that blob's source)."""
+        table = self.get(blob, path)
+        if table is None:
+            table = declaration_table(path, text)
+            with self._lock:
+                self._entries[(blob, path.rsplit(".", 1)[-1])] = table
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return table
+
+
+TABLES = TableCache()
+
+
+def classify(old: dict, new: dict) -> list:
+    """
+    Compares two declaration tables and returns (change_type, name, detail) rows:
+    RENAME, PARAM_ADDED, PARAM_REMOVED, PARAMS_CHANGED, REMOVED or ADDED.
+    """
+    changes = []
+    for name in sorted(old.keys() & new.keys(), key=lambda n: new[n].line):
+        before, after = old[name].params, new[name].params
+        if before == after:
+            continue
+        added = [p for p in after if p not in before]
+        removed = [p for p in before if p not in after]
+        if added and not removed:
+            changes.append(("PARAM_ADDED", name, "+" + ", +".join(added)))
+        elif removed and not added:
+            changes.append(("PARAM_REMOVED", name, "-" + ", -".join(removed)))
+        else:
+            changes.append(("PARAMS_CHANGED", name, f"({', '.join(before)}) -> ({', '.join(after)})"))
+
+    gone = sorted(old.keys() - new.keys(), key=lambda n: old[n].line)
+    fresh = sorted(new.keys() - old.keys(), key=lambda n: new[n].line)
+    for name in list(gone):
+        parent = name.rpartition(".")[0]
+        for candidate in fresh:
+            if (candidate.rpartition(".")[0] == parent
+                    and new[candidate].kind == old[name].kind
+                    and new[candidate].params == old[name].params):
+                changes.append(("RENAME", name, f"-> {candidate}"))
+                gone.remove(name)
+                fresh.remove(candidate)
+                break
+
+    changes += [("REMOVED", name, "") for name in gone]
+    changes += [("ADDED", name, "") for name in fresh]
+    return changes
@@ -0,0 +1,270 @@
+"""
+Module dependency graph built from import statements.
+
+Each source file's imports are parsed once and re-parsed only when its size
+or mtime changes (like the token index). Raw import strings are resolved to
+project files by cheap dictionary lookups, and the reverse edges let impact
+queries walk "who depends on this file, transitively" without a scan.
+
+Supported: Python (import/from), TS/JS (import/export from/require/import()),
+Java (import, incl. wildcards), C# (using -> files declaring the namespace),
+C/C++ (#include "...").
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from codedoc.flight import FLIGHTS
+from codedoc.index import get_index
+from codedoc.jobs import poll
+from codedoc.stats import count
+from codedoc.symbols import read_text
+
+GRAPH_EXTS = ('.py', '.ts', '.tsx', '.js', '.jsx', '.mjs', '.java', '.cs', '.c', '.cc', '.cpp', '.h', '.hpp')
+
+# Seconds during which the graph is trusted without re-statting files.
+GRAPH_SYNC_INTERVAL = 2.0
+
+# Default depth limit of transitive queries.
+DEFAULT_MAX_DEPTH = 3
+
+_JS_EXTS = ('.ts', '.tsx', '.js', '.jsx', '.mjs')
+_C_EXTS = ('.c', '.cc', '.cpp', '.h', '.hpp')
+
+_PY_IMPORT = re.compile(r"^\s*import\s+([\w.]+(?:\s+as\s+\w+)?(?:\s*,\s*[\w.]+(?:\s+as\s+\w+)?)*)", re.M)
+# Imported names: a parenthesised (possibly multi-line) list, or the rest of the line
+_PY_FROM = re.compile(r"^[ \t]*from[ \t]+(\.*[\w.]*)[ \t]+import[ \t]*(?:\(([^)]*)\)|([ \t\w,*]+))", re.M)
+_PY_COMMENT = re.compile(r"#[^\n]*")
+_JS_IMPORT = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(?\s*|\brequire\s*\(\s*)['"]([^'"]+)['"]""")
+_JAVA_IMPORT = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;", re.M)
+_CS_USING = re.compile(r"^\s*using\s+(?:static\s+)?(?:\w+\s*=\s*)?([\w.]+)\s*;", re.M)
+_CS_NAMESPACE = re.compile(r"^\s*namespace\s+([\w.]+)", re.M)
+_C_INCLUDE = re.compile(r"""^\s*#\s*include\s+"([^"]+)\"""", re.M)
+
+
+def parse_imports(rel: str, text: str) -> tuple:
+    """
+    Raw imports of one file as (kind, target) pairs, plus the C# namespaces it declares.
+    Kinds: 'py' (dotted, leading dots = relative), 'js' (specifier), 'java', 'cs', 'c'.
+    """
+    imports, namespaces = [], ()
+    if rel.endswith('.py'):
+        for match in _PY_IMPORT.finditer(text):
+            for part in match.group(1).split(','):
+                imports.append(('py', part.split()[0]))
+        for match in _PY_FROM.finditer(text):
+            module = match.group(1)
+            imports.append(('py', module))
+            # 'from pkg import mod' may name submodules
+            names = match.group(3) if match.group(2) is None else _PY_COMMENT.sub('', match.group(2))
+            for name in names.split(','):
+                name = name.split()[0] if name.split() else ''
+                if name and name != '*':
+                    imports.append(('py', f"{module}.{name}" if not module.endswith('.') else module + name))
+    elif rel.endswith(_JS_EXTS):
+        imports = [('js', spec) for spec in _JS_IMPORT.findall(text) if spec.startswith('.')]
+    elif rel.endswith('.java'):
+        imports = [('java', name) for name in _JAVA_IMPORT.findall(text)]
+    elif rel.endswith('.cs'):
+        imports = [('cs', name) for name in _CS_USING.findall(text)]
+        namespaces = tuple(_CS_NAMESPACE.findall(text))
+    elif rel.endswith(_C_EXTS):
+        imports = [('c', name) for name in _C_INCLUDE.findall(text)]
+    return tuple(dict.fromkeys(imports)), namespaces
+
+
+class DependencyGraph:
+    """
+    - _files: rel_path -> (size, mtime_ns, imports, namespaces)
+    - _deps / _rdeps: resolved forward and reverse edges, rebuilt lazily after changes.
+    """
+
+    def __init__(self, root: str, suffixes: tuple = GRAPH_EXTS, sync_interval: float = GRAPH_SYNC_INTERVAL):
+        self.project = get_index(root)
+        self.root = self.project.root
+        self.suffixes = suffixes
+        self.sync_interval = sync_interval
+        self._files = {}
+        self._deps = {}
+        self._rdeps = {}
+        self._dirty = True
+        self._lock = threading.RLock()
+        self._last_sync = None
+
+    def sync(self, force: bool = False, job=None):
+        """Re-parses new or changed files and drops deleted ones (one pass for concurrent callers)."""
+        if not force and self._last_sync is not None and time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        FLIGHTS.do(("imports", self.root, self.suffixes, force), lambda: self._sync(force, job), job=job)
+
+    def _sync(self, force: bool, job=None):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_sync is not None and now - self._last_sync < self.sync_interval:
+                return
+
+            current = self.project.files(self.suffixes)
+            for rel in set(self._files).difference(current):
+                del self._files[rel]
+                self._dirty = True
+
+            for done, rel in enumerate(current):
+                poll(job, done, len(current), "Reading imports")
+                path = self.project.abspath(rel)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    self._files.pop(rel, None)
+                    self._dirty = True
+                    continue
+                entry = self._files.get(rel)
+                if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                    continue
+                try:
+                    imports, namespaces = parse_imports(rel, read_text(path))
+                except OSError:
+                    continue
+                count("files_parsed")
+                if entry is None or entry[2:] != (imports, namespaces):
+                    self._dirty = True
+                self._files[rel] = (st.st_size, st.st_mtime_ns, imports, namespaces)
+
+            if self._dirty:
+                self._resolve_all()
+            self._last_sync = time.monotonic()
+
+    # --- resolution ---------------------------------------------------------
+
+    def _resolve_all(self):
+        paths = set(self._files)
+        # Python source roots: the project root plus every folder holding a top-level
+        # package (a folder without __init__.py whose subfolder has one, e.g. 'src')
+        py_packages = {os.path.dirname(rel) for rel in paths if os.path.basename(rel) == '__init__.py'}
+        py_roots = {''} | {os.path.dirname(d) for d in py_packages if os.path.dirname(d) not in py_packages}
+
+        # Python: dotted names relative to each source root above the file ('src.pkg.mod', 'pkg.mod');
+        # Java: every dotted suffix ('com.x.Foo', 'x.Foo', 'Foo')
+        modules, packages, namespaces = {}, {}, {}
+        for rel, (_, _, _, declared) in self._files.items():
+            posix = rel.replace(os.sep, '/')
+            stem, ext = os.path.splitext(posix)
+            parts = stem.split('/')
+            if ext == '.py':
+                if parts[-1] == '__init__':
+                    parts = parts[:-1]
+                for i in range(len(parts)):
+                    if os.sep.join(parts[:i]) in py_roots:
+                        modules.setdefault((ext, '.'.join(parts[i:])), []).append(rel)
+            elif ext == '.java':
+                for i in range(len(parts)):
+                    modules.setdefault((ext, '.'.join(parts[i:])), []).append(rel)
+                    if i < len(parts) - 1:
+                        packages.setdefault('.'.join(parts[i:-1]), []).append(rel)
+            for ns in declared:
+                namespaces.setdefault(ns, []).append(rel)
+
+        deps = {}
+        for rel, (_, _, imports, _) in self._files.items():
+            targets = set()
+            for kind, target in imports:
+                targets.update(self._resolve(rel, kind, target, paths, modules, packages, namespaces, py_packages))
+            targets.discard(rel)
+            deps[rel] = targets
+
+        rdeps = {}
+        for rel, targets in deps.items():
+            for target in targets:
+                rdeps.setdefault(target, set()).add(rel)
+        self._deps, self._rdeps, self._dirty = deps, rdeps, False
+
+    def _resolve(self, rel, kind, target, paths, modules, packages, namespaces, py_packages) -> list:
+        here = os.path.dirname(rel)
+        if kind == 'py':
+            dots = len(target) - len(target.lstrip('.'))
+            name = target[dots:]
+            if dots:
+                base = here
+                for _ in range(dots - 1):
+                    base = os.path.dirname(base)
+                candidate = os.path.join(base, *name.split('.')) if name else base
+                return [p for p in (candidate + '.py', os.path.join(candidate, '__init__.py')) if p in paths]
+            if here not in py_packages:
+                # A script outside any package also sees its own folder first
+                candidate = os.path.join(here, *name.split('.'))
+                local = [p for p in (candidate + '.py', os.path.join(candidate, '__init__.py')) if p in paths]
+                if local:
+                    return local
+            # Names that match no project module (stdlib, site-packages) stay unresolved
+            return modules.get(('.py', name), [])
+        if kind == 'js':
+            base = os.path.normpath(os.path.join(here, target))
+            if base in paths:
+                return [base]
+            for ext in _JS_EXTS:
+                if base + ext in paths:
+                    return [base + ext]
+            for ext in _JS_EXTS:
+                index = os.path.join(base, 'index' + ext)
+                if index in paths:
+                    return [index]
+            # './x.js' written for a './x.ts' source (TS ESM style)
+            stem = os.path.splitext(base)[0]
+            return [stem + ext for ext in _JS_EXTS if stem + ext in paths][:1]
+        if kind == 'java':
+            if target.endswith('.*'):
+                return packages.get(target[:-2], [])
+            return modules.get(('.java', target), [])
+        if kind == 'cs':
+            return namespaces.get(target, [])
+        if kind == 'c':
+            local = os.path.normpath(os.path.join(here, target))
+            if local in paths:
+                return [local]
+            # Include paths are unknown: fall back to the file name (every match counts)
+            return [p for p in self.project.resolve(target) if p in paths]
+        return []
+
+    # --- queries ------------------------------------------------------------
+
+    def dependencies(self, rel: str, job=None) -> list:
+        """Files ``rel`` imports directly."""
+        self.sync(job=job)
+        with self._lock:
+            return sorted(self._deps.get(rel, ()))
+
+    def dependents(self, rel: str, max_depth: int = DEFAULT_MAX_DEPTH, job=None) -> list:
+        """
+        Files that import ``rel`` directly or transitively, as (rel_path, distance)
+        sorted by distance then path. ``max_depth`` <= 0 means unlimited.
+        """
+        self.sync(job=job)
+        with self._lock:
+            seen = {rel: 0}
+            queue = deque([rel])
+            while queue:
+                current = queue.popleft()
+                distance = seen[current]
+                if max_depth > 0 and distance >= max_depth:
+                    continue
+                for parent in self._rdeps.get(current, ()):
+                    if parent not in seen:
+                        seen[parent] = distance + 1
+                        queue.append(parent)
+        del seen[rel]
+        return sorted(seen.items(), key=lambda item: (item[1], item[0]))
+
+
+_GRAPHS = {}
+_GRAPHS_LOCK = threading.Lock()
+
+
+def get_dependency_graph(root: str) -> DependencyGraph:
+    """Returns the shared dependency graph for ``root``, creating it on first use."""
+    root = os.path.abspath(root)
+    with _GRAPHS_LOCK:
+        graph = _GRAPHS.get(root)
+        if graph is None:
+            graph = _GRAPHS[root] = DependencyGraph(root)
+    return graph
@@ -0,0 +1,194 @@
+"""
+Content-addressed documentation store.
+
+Docs are written to ``documentation/<source>_<key8>_<hash12>.md``: ``source``
+is the flattened source path (its last SOURCE_NAME_CHARS characters), ``key8``
+a hash of the full path (so 'a/b.py' and 'a_b.py' never share a name)
+and ``hash12`` the source's content hash. ``documentation/index.json`` maps each source
+to its current doc and its older revisions:
+
+    {"sources": {"src/api.py": {"hash": ..., "doc": ..., "generated": ...,
+                                "history": [{"hash": ..., "doc": ..., "generated": ...}]}}}
+
+Re-documenting an unchanged source is a no-op, the current doc of a source
+is one dict lookup, and only the newest ``retention`` revisions are kept.
+Batches write their docs concurrently and save the manifest once.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from codedoc.cache import write_json_atomic
+
+DOCS_DIR = "documentation"
+MANIFEST_NAME = "index.json"
+
+# Revisions kept per source (current one included); older doc files are deleted.
+DOC_RETENTION = 5
+
+# Characters of the flattened source path kept in doc names (file names are limited to 255 bytes).
+SOURCE_NAME_CHARS = 80
+
+# Concurrent doc writers of one batch.
+DOC_WRITE_WORKERS = 8
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()
+
+
+def source_key(root: str, path: str) -> str:
+    """Manifest key of a source file: its project-relative path with '/' separators."""
+    return os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/")
+
+
+class DocStore:
+    def __init__(self, root: str, retention: int = DOC_RETENTION):
+        self.root = os.path.abspath(root)
+        self.folder = os.path.join(self.root, DOCS_DIR)
+        self.manifest_path = os.path.join(self.folder, MANIFEST_NAME)
+        self.retention = max(1, retention)
+        self._lock = threading.Lock()
+        self._sources = None
+        self._mtime = None
+
+    def _load(self):
+        """(Re)reads the manifest when it changed on disk (e.g. another server process)."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._sources is not None and mtime == self._mtime:
+            return
+        self._sources, self._mtime = {}, mtime
+        if mtime is None:
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._sources = dict(data.get("sources", {}))
+        except (OSError, ValueError, AttributeError):
+            pass  # a broken manifest is rebuilt from scratch
+
+    def _save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        write_json_atomic(self.manifest_path, {"version": 1, "sources": self._sources})
+        self._mtime = os.stat(self.manifest_path).st_mtime_ns
+
+    def current(self, key: str):
+        """Manifest entry of the current doc for ``key``, or None."""
+        with self._lock:
+            self._load()
+            return self._sources.get(key)
+
+    def documented(self) -> set:
+        """Keys of every source with a current doc."""
+        with self._lock:
+            self._load()
+            return set(self._sources)
+
+    def _is_current(self, key: str, source_hash: str) -> bool:
+        entry = self._sources.get(key)
+        return bool(entry) and entry["hash"] == source_hash and os.path.exists(os.path.join(self.folder, entry["doc"]))
+
+    def _write_doc(self, key: str, source_hash: str, content: str) -> str:
+        """Writes one doc file (temp file + os.replace) and returns its name."""
+        readable = key.replace('/', '_').replace('.', '_')[-SOURCE_NAME_CHARS:]
+        name = f"{readable}_{text_digest(key)[:8]}_{source_hash[:12]}.md"
+        doc_path = os.path.join(self.folder, name)
+        tmp_path = f"{doc_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, doc_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return name
+
+    def _record(self, key: str, source_hash: str, name: str):
+        """Makes ``name`` the current doc of ``key`` and prunes revisions beyond retention."""
+        entry = self._sources.get(key)
+        revision = {"hash": source_hash, "doc": name, "generated": datetime.now().isoformat(timespec="seconds")}
+        history = []
+        if entry:
+            history = [{k: entry[k] for k in ("hash", "doc", "generated")}] + entry.get("history", [])
+            history = [r for r in history if r["doc"] != name]
+        kept, dropped = history[:self.retention - 1], history[self.retention - 1:]
+        self._sources[key] = dict(revision, history=kept)
+
+        live = {name} | {r["doc"] for r in kept}
+        for old in dropped:
+            if old["doc"] not in live:
+                try:
+                    os.remove(os.path.join(self.folder, old["doc"]))
+                except OSError:
+                    pass
+
+    def put(self, key: str, source_hash: str, content: str, force: bool = False) -> tuple:
+        """
+        Stores ``content`` as the doc of ``key`` at version ``source_hash``.
+        Returns (doc_path, written): written is False when that version is already documented.
+        """
+        with self._lock:
+            os.makedirs(self.folder, exist_ok=True)
+            self._load()
+            if self._is_current(key, source_hash) and not force:
+                return os.path.join(self.folder, self._sources[key]["doc"]), False
+            name = self._write_doc(key, source_hash, content)
+            self._record(key, source_hash, name)
+            self._save()
+            return os.path.join(self.folder, name), True
+
+    def put_many(self, items: list, force: bool = False, workers: int = DOC_WRITE_WORKERS) -> list:
+        """
+        Batch ``put``: ``items`` are (key, source_hash, content) tuples.
+        Doc files are written concurrently (at most ``workers`` at once) and the
+        manifest is saved once. Returns (doc_path, written, error) per item, in order.
+        """
+        results = [None] * len(items)
+        with self._lock:
+            os.makedirs(self.folder, exist_ok=True)
+            self._load()
+            pending = []
+            for i, (key, source_hash, content) in enumerate(items):
+                if self._is_current(key, source_hash) and not force:
+                    results[i] = (os.path.join(self.folder, self._sources[key]["doc"]), False, None)
+                else:
+                    pending.append(i)
+
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                futures = {i: pool.submit(self._write_doc, *items[i]) for i in pending}
+            for i, future in futures.items():
+                key, source_hash, _ = items[i]
+                try:
+                    name = future.result()
+                except OSError as e:
+                    results[i] = (None, False, str(e))
+                    continue
+                self._record(key, source_hash, name)
+                results[i] = (os.path.join(self.folder, name), True, None)
+
+            if any(r[1] for r in results):
+                self._save()
+        return results
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_doc_store(root: str) -> DocStore:
+    """Returns the shared doc store for ``root``, creating it on first use."""
+    root = os.path.abspath(root)
+    with _STORES_LOCK:
+        store = _STORES.get(root)
+        if store is None:
+            store = _STORES[root] = DocStore(root)
+    return store
@@ -0,0 +1,62 @@
+"""
+Singleflight coalescing of identical concurrent work.
+
+Clients often fire several tool calls at once (an audit next to a guardian
+scan, repeated impact queries while typing). When two calls need the same
+index refresh, sync or scan, the first one runs it and the others wait for
+its result. Finished results are never reused: a later call always sees the
+disk as it is then (the on-disk caches keep repeated work cheap).
+"""
+import threading
+
+from codedoc.jobs import JobCancelled, poll
+from codedoc.stats import count
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn, job=None):
+        """
+        Returns ``fn()``, sharing one execution among concurrent callers with the same ``key``.
+        Results are shared: callers must not mutate them.
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+
+            if leader:
+                try:
+                    flight.result = fn()
+                except BaseException as e:
+                    flight.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._flights[key]
+                    flight.done.set()
+                return flight.result
+
+            count("coalesced_calls")
+            while not flight.done.wait(0.1):
+                poll(job)
+            if isinstance(flight.error, JobCancelled):
+                continue  # the leader's call was cancelled, not ours: run it ourselves
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+
+FLIGHTS = SingleFlight()
@@ -0,0 +1,177 @@
+"""
+Compiled ``.gitignore`` / ``.codedocignore`` matching.
+
+Each ignore file is compiled once into regexes and kept together with its
+mtime. Rules are chained per directory (root first, deepest last, and
+``.codedocignore`` after ``.gitignore``), and the last matching rule wins,
+as in git. The project index asks the matcher while it lists a directory,
+so ignored folders are pruned before they are ever walked.
+"""
+import os
+import re
+from collections import namedtuple
+
+IGNORE_FILES = ('.gitignore', '.codedocignore')
+
+# One compiled pattern: regex over the path relative to the ignore file's folder.
+Rule = namedtuple("Rule", "regex negated dir_only basename")
+
+
+def _translate(glob: str) -> str:
+    """gitignore glob -> regex body ('**' crosses folders, '*' and '?' do not)."""
+    out, i, n = [], 0, len(glob)
+    while i < n:
+        ch = glob[i]
+        if glob.startswith('**/', i) and (i == 0 or glob[i - 1] == '/'):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        if glob.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        if ch == '*':
+            out.append('[^/]*')
+        elif ch == '?':
+            out.append('[^/]')
+        elif ch == '[':
+            end = glob.find(']', i + 2 if glob[i + 1:i + 2] in ('!', '^') else i + 1)
+            if end == -1:
+                out.append(re.escape(ch))
+            else:
+                body = glob[i + 1:end]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        elif ch == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return ''.join(out)
+
+
+def compile_rules(text: str) -> tuple:
+    rules = []
+    for line in text.splitlines():
+        if not line.strip() or line.startswith('#'):
+            continue
+        line = line.rstrip()
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        elif line.startswith('\\'):
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+        basename = '/' not in line
+        glob = line.lstrip('/')
+        try:
+            regex = re.compile(_translate(glob) + r'\Z')
+        except re.error:
+            continue
+        rules.append(Rule(regex, negated, dir_only, basename))
+    return tuple(rules)
+
+
+class IgnoreFile:
+    """Compiled rules of one ignore file living in ``base`` (project-relative folder)."""
+
+    def __init__(self, base: str, path: str, stamp: tuple, rules: tuple):
+        self.base = base
+        self.path = path
+        self.stamp = stamp
+        self.rules = rules
+
+
+def _stamp(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class IgnoreMatcher:
+    """
+    Per-directory ignore rules of one project.
+    - _own: rel_dir -> tuple of IgnoreFile found in that folder
+    - _chains: rel_dir -> every IgnoreFile that applies there (cached, rebuilt lazily)
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._own = {}
+        self._chains = {}
+
+    def _read(self, base: str, rel_path: str):
+        path = os.path.join(self.root, rel_path)
+        stamp = _stamp(path)
+        if stamp is None:
+            return None
+        previous = next((f for f in self._own.get(base, ()) if f.path == path), None)
+        if previous is not None and previous.stamp == stamp:
+            return previous
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                rules = compile_rules(f.read())
+        except OSError:
+            return None
+        return IgnoreFile(base, path, stamp, rules)
+
+    def load(self, rel: str, file_names) -> bool:
+        """
+        (Re)loads the ignore files of folder ``rel`` given its file names
+        (plus ``.git/info/exclude`` for the root). Returns True when that folder's rules changed.
+        """
+        sources = [os.path.join('.git', 'info', 'exclude')] if not rel else []
+        sources += [os.path.join(rel, name) if rel else name for name in IGNORE_FILES if name in file_names]
+        found = tuple(f for f in (self._read(rel, source) for source in sources) if f is not None)
+        old = self._own.get(rel, ())
+        if [(f.path, f.stamp) for f in old] == [(f.path, f.stamp) for f in found]:
+            return False
+        if found:
+            self._own[rel] = found
+        else:
+            self._own.pop(rel, None)
+        self._chains.clear()
+        return True
+
+    def forget(self, rel: str):
+        """Drops the rules of ``rel`` and every folder below it."""
+        prefix = rel + os.sep if rel else ''
+        for key in [k for k in self._own if k == rel or k.startswith(prefix)]:
+            del self._own[key]
+        self._chains.clear()
+
+    def stale_dirs(self) -> list:
+        """Folders whose ignore files were edited in place since they were loaded, outermost first."""
+        stale = [rel for rel, files in self._own.items() if any(_stamp(f.path) != f.stamp for f in files)]
+        return sorted(stale, key=lambda rel: (rel.count(os.sep), rel))
+
+    def _chain(self, rel: str) -> tuple:
+        chain = self._chains.get(rel)
+        if chain is None:
+            parent = self._chain(os.path.dirname(rel)) if rel else ()
+            chain = self._chains[rel] = parent + self._own.get(rel, ())
+        return chain
+
+    def ignored(self, rel_dir: str, name: str, is_dir: bool) -> bool:
+        """True when entry ``name`` of folder ``rel_dir`` is ignored."""
+        chain = self._chain(rel_dir)
+        if not chain:
+            return False
+        rel_path = (rel_dir + '/' + name if rel_dir else name).replace(os.sep, '/')
+        for ignore_file in reversed(chain):
+            base = ignore_file.base.replace(os.sep, '/')
+            sub = rel_path[len(base) + 1:] if base else rel_path
+            for rule in reversed(ignore_file.rules):
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(name if rule.basename else sub):
+                    return not rule.negated
+        return False
@@ -0,0 +1,259 @@
+"""
+Shared project file index.
+
+Every tool used to run its own ``os.walk`` with its own ignore list. The index
+walks the project once, keeps the listing in memory and stays current with
+cheap stat checks: only directories whose mtime changed since the last
+refresh are listed again. Besides the fixed IGNORE_DIRS baseline, nested
+``.gitignore`` / ``.codedocignore`` files prune the walk.
+"""
+import os
+import threading
+import time
+
+from codedoc.flight import FLIGHTS
+from codedoc.ignore import IgnoreMatcher
+from codedoc.stats import count
+
+# Baseline pruning for every tool (on top of the project's ignore files): hidden folders plus heavy/generated folders.
+IGNORE_DIRS = {'node_modules', '.git', '__pycache__', 'venv', '.env', 'dist', 'build', 'bin', 'obj', 'Library'}
+
+# Seconds during which a refreshed index is trusted without re-checking the disk.
+REFRESH_INTERVAL = 2.0
+
+
+def is_pruned_dir(name: str) -> bool:
+    """Returns True when a directory should never be walked."""
+    return name.startswith('.') or name in IGNORE_DIRS
+
+
+def _join(rel: str, name: str) -> str:
+    return os.path.join(rel, name) if rel else name
+
+
+class ProjectIndex:
+    """
+    In-memory listing of the documentable tree under ``root``.
+
+    Directories are stored as ``rel_dir -> (mtime_ns, subdirs, files)``.
+    Creating, deleting or renaming an entry bumps the parent directory's
+    mtime, so a refresh only has to ``stat`` the known directories and
+    re-list the ones that changed.
+
+    A case-folded ``basename -> {rel_path}`` map is maintained alongside,
+    so resolving a file name never needs a walk. ``_dir_gen`` remembers the
+    generation in which each directory was last (re)listed, so consumers can
+    ask which folders changed since they last looked.
+    """
+
+    def __init__(self, root: str, refresh_interval: float = REFRESH_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.refresh_interval = refresh_interval
+        self.generation = 0
+        self._dirs = {}
+        self._dir_gen = {}
+        self._by_name = {}
+        self._lock = threading.RLock()
+        self._last_refresh = None
+        self._listing = None
+        self._filtered = {}
+        self.ignores = IgnoreMatcher(self.root)
+
+    # --- building -----------------------------------------------------------
+
+    def _list_dir(self, rel: str):
+        """
+        Returns ((mtime_ns, subdirs, files), rules_changed), or (None, False) when ``rel`` is gone.
+        rules_changed is True when the folder's own ignore files differ from the last listing.
+        """
+        path = os.path.join(self.root, rel) if rel else self.root
+        subdirs, files = [], []
+        count("dirs_listed")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not is_pruned_dir(entry.name):
+                                subdirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None, False
+
+        rules_changed = self.ignores.load(rel, files)
+        subdirs = [d for d in subdirs if not self.ignores.ignored(rel, d, True)]
+        files = [f for f in files if not self.ignores.ignored(rel, f, False)]
+        return (mtime, tuple(sorted(subdirs)), tuple(sorted(files))), rules_changed
+
+    def _set_files(self, rel: str, old: tuple, new: tuple):
+        """Keeps the basename map in step with one directory's file list."""
+        for name in set(old).difference(new):
+            paths = self._by_name.get(name.casefold())
+            if paths is not None:
+                paths.discard(_join(rel, name))
+                if not paths:
+                    del self._by_name[name.casefold()]
+        for name in set(new).difference(old):
+            self._by_name.setdefault(name.casefold(), set()).add(_join(rel, name))
+
+    def _add_tree(self, rel: str):
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            listing, _ = self._list_dir(current)
+            if listing is None:
+                continue
+            old = self._dirs.get(current)
+            self._dirs[current] = listing
+            self._dir_gen[current] = self.generation + 1
+            self._set_files(current, old[2] if old else (), listing[2])
+            stack.extend(_join(current, d) for d in listing[1])
+
+    def _drop_tree(self, rel: str):
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            listing = self._dirs.pop(current, None)
+            self._dir_gen.pop(current, None)
+            self.ignores.forget(current)
+            if listing:
+                self._set_files(current, listing[2], ())
+                stack.extend(_join(current, d) for d in listing[1])
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Brings the index up to date with the disk.
+        Returns True when the listing changed. Concurrent refreshes share one pass.
+        """
+        if not force and self._last_refresh is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return False
+        return FLIGHTS.do(("refresh", self.root, force), lambda: self._refresh(force))
+
+    def _refresh(self, force: bool) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return False
+
+            changed = False
+            if self._last_refresh is None:
+                self._add_tree('')
+                changed = True
+            else:
+                # Ignore files edited in place do not touch their folder's mtime
+                for rel in self.ignores.stale_dirs():
+                    if rel in self._dirs:
+                        self._drop_tree(rel)
+                        self._add_tree(rel)
+                        changed = True
+
+                for rel in list(self._dirs):
+                    old = self._dirs.get(rel)
+                    if old is None:
+                        continue  # dropped earlier in this pass
+                    path = os.path.join(self.root, rel) if rel else self.root
+                    try:
+                        mtime = os.stat(path).st_mtime_ns
+                    except OSError:
+                        self._drop_tree(rel)
+                        changed = True
+                        continue
+                    if mtime == old[0]:
+                        continue
+
+                    new, rules_changed = self._list_dir(rel)
+                    if new is None:
+                        self._drop_tree(rel)
+                        changed = True
+                        continue
+                    if rules_changed:
+                        # An ignore file appeared or vanished: re-walk the folder under the new rules
+                        self._drop_tree(rel)
+                        self._add_tree(rel)
+                        changed = True
+                        continue
+                    self._dirs[rel] = new
+                    self._dir_gen[rel] = self.generation + 1
+                    self._set_files(rel, old[2], new[2])
+                    for d in set(old[1]) - set(new[1]):
+                        self._drop_tree(_join(rel, d))
+                    for d in set(new[1]) - set(old[1]):
+                        self._add_tree(_join(rel, d))
+                    changed = True
+
+            if changed:
+                self.generation += 1
+                self._listing = None
+                self._filtered = {}
+            self._last_refresh = time.monotonic()
+            return changed
+
+    # --- queries ------------------------------------------------------------
+
+    def files(self, suffixes: tuple = None) -> list:
+        """
+        Returns project-relative file paths in a stable, sorted order.
+        - suffixes: Only keep names ending with one of these (e.g. ('.py', '.ts')).
+        """
+        self.refresh()
+        with self._lock:
+            if self._listing is None:
+                self._listing = [_join(rel, f) for rel in sorted(self._dirs) for f in self._dirs[rel][2]]
+
+            result = self._filtered.get(suffixes)
+            if result is None:
+                result = self._listing if not suffixes else [p for p in self._listing if p.endswith(suffixes)]
+                self._filtered[suffixes] = result
+            return list(result)
+
+    def changed_dirs(self, since: int) -> set:
+        """Directories listed (or re-listed) after generation ``since``; deleted ones are not included."""
+        with self._lock:
+            return {rel for rel, gen in self._dir_gen.items() if gen > since}
+
+    def resolve(self, file_path: str) -> list:
+        """
+        Returns every project file matching ``file_path``, sorted.
+        An exact project-relative (or absolute) path is returned alone. Otherwise
+        matching is case-insensitive on the file name; when ``file_path`` has
+        folders (e.g. 'api/Client.ts'), paths ending with them are preferred.
+        """
+        if os.path.isabs(file_path):
+            file_path = os.path.relpath(file_path, self.root)
+        rel = os.path.normpath(file_path).replace('\\', '/')
+        wanted = rel.casefold()
+        self.refresh()
+        with self._lock:
+            candidates = sorted(self._by_name.get(os.path.basename(wanted), ()))
+
+        exact = [p for p in candidates if p.replace(os.sep, '/') == rel]
+        if exact:
+            return exact
+
+        if '/' in wanted.lstrip('./'):
+            suffix = '/' + wanted.lstrip('./')
+            exact = [p for p in candidates if ('/' + p.replace(os.sep, '/').casefold()).endswith(suffix)]
+            if exact:
+                return exact
+        return candidates
+
+    def abspath(self, rel_path: str) -> str:
+        return os.path.join(self.root, rel_path)
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_index(root: str) -> ProjectIndex:
+    """Returns the shared index for ``root``, creating it on first use."""
+    root = os.path.abspath(root)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(root)
+        if index is None:
+            index = _INDEXES[root] = ProjectIndex(root)
+    return index
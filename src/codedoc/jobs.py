@@ -0,0 +1,118 @@
+"""
+Running blocking work off the FastMCP event loop.
+
+Filesystem scans run in worker threads and git runs as an async subprocess,
+so one long scan no longer freezes the stdio server. Work receives a ``Job``
+that it polls for cancellation and feeds with progress, which is forwarded
+to the client as MCP progress notifications.
+"""
+import asyncio
+import threading
+import time
+
+from codedoc.stats import count, profiled
+
+# Minimum seconds between two progress notifications of one job.
+PROGRESS_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    """Raised inside worker code once the awaiting tool call was cancelled."""
+
+
+class Job:
+    """Cancellation flag and progress reporter shared with a worker thread."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None, ctx=None):
+        self._loop = loop
+        self._ctx = ctx
+        self._cancelled = threading.Event()
+        self._last_report = 0.0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raises JobCancelled when the tool call was cancelled."""
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def progress(self, done: float, total: float = None, message: str = None):
+        """Checks for cancellation and sends a (throttled) progress notification."""
+        self.check()
+        if self._ctx is None or self._loop is None:
+            return
+        now = time.monotonic()
+        if now - self._last_report < PROGRESS_INTERVAL and done != total:
+            return
+        self._last_report = now
+        asyncio.run_coroutine_threadsafe(self._ctx.report_progress(done, total, message), self._loop)
+
+
+def poll(job: "Job | None", done: int = None, total: int = None, message: str = None):
+    """Progress/cancellation hook for helpers that may run without a job."""
+    if job is None:
+        return
+    if done is None:
+        job.check()
+    else:
+        job.progress(done, total, message)
+
+
+async def run_blocking(fn, *args, ctx=None, **kwargs):
+    """
+    Runs ``fn(*args, job=..., **kwargs)`` in a worker thread.
+    Cancelling the awaiting task flags the job so the worker stops at its next check.
+    """
+    job = Job(asyncio.get_running_loop(), ctx)
+    try:
+        return await asyncio.to_thread(profiled(fn), *args, job=job, **kwargs)
+    except asyncio.CancelledError:
+        job.cancel()
+        raise
+
+
+async def stream_git(args: list, cwd: str):
+    """Yields the raw stdout lines of ``git <args>`` as they are produced."""
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args, cwd=cwd,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        limit=1 << 24,
+    )
+    try:
+        async for raw in proc.stdout:
+            yield raw
+        await proc.wait()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        count("git_calls")
+        count("git_s", time.perf_counter() - start)
+    if proc.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed")
+
+
+async def run_git(args: list, cwd: str) -> str:
+    """Runs ``git <args>`` without blocking the event loop and returns its stdout."""
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args, cwd=cwd,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+    finally:
+        count("git_calls")
+        count("git_s", time.perf_counter() - start)
+    if proc.returncode != 0:
+        raise RuntimeError(stderr.decode(errors="replace").strip() or f"git {' '.join(args)} failed")
+    return stdout.decode(errors="replace")
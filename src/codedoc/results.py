@@ -0,0 +1,98 @@
+"""
+Result-set cache for paginated tool output.
+
+Tools keep their full result as compact tuples here and return one page at a
+time. The cursor handed back to the client (``"<id>:<offset>"``) lets the next
+page be served straight from memory instead of rescanning the project.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+# Result sets kept in memory at once; the least recently used one is dropped first.
+MAX_RESULT_SETS = 32
+
+# Seconds a result set stays valid for follow-up pages.
+RESULT_TTL = 600
+
+
+class ResultStore:
+    """LRU of ``id -> (query_key, rows, created)`` with one live id per query key."""
+
+    def __init__(self, max_sets: int = MAX_RESULT_SETS, ttl: float = RESULT_TTL):
+        self.max_sets = max_sets
+        self.ttl = ttl
+        self._sets = OrderedDict()
+        self._by_key = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def put(self, key: tuple, rows: list) -> str:
+        """Stores ``rows`` for ``key`` (replacing the previous set) and returns its id."""
+        with self._lock:
+            old_id = self._by_key.pop(key, None)
+            if old_id is not None:
+                self._sets.pop(old_id, None)
+            result_id = f"r{next(self._ids)}"
+            self._sets[result_id] = (key, rows, time.monotonic())
+            self._by_key[key] = result_id
+            while len(self._sets) > self.max_sets:
+                _, (old_key, _, _) = self._sets.popitem(last=False)
+                self._by_key.pop(old_key, None)
+            return result_id
+
+    def get(self, result_id: str, kinds: tuple = None):
+        """
+        Returns (key, rows) for a live result id, or None once evicted/expired.
+        - kinds: Result kinds (``key[0]``) the calling tool can page; others raise ValueError.
+        """
+        with self._lock:
+            entry = self._sets.get(result_id)
+            if entry is None:
+                return None
+            key, rows, created = entry
+            if kinds is not None and key[0] not in kinds:
+                raise ValueError("Invalid cursor for this tool")
+            if time.monotonic() - created > self.ttl:
+                del self._sets[result_id]
+                self._by_key.pop(key, None)
+                return None
+            self._sets.move_to_end(result_id)
+            return key, rows
+
+
+def make_cursor(result_id: str, offset: int) -> str:
+    return f"{result_id}:{offset}"
+
+
+def parse_cursor(cursor: str) -> tuple:
+    """Returns (result_id, offset); raises ValueError for malformed cursors."""
+    result_id, _, offset = cursor.partition(":")
+    if not result_id or not offset.isdigit():
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return result_id, int(offset)
+
+
+def check_offset(offset: int, total: int):
+    """Raises ValueError for a cursor offset past the end of its result set (a stale cursor)."""
+    if offset and offset >= total:
+        raise ValueError(f"Cursor offset {offset} is past the last of {total} results; call again without a cursor")
+
+
+def check_page_size(page_size: int):
+    """Raises ValueError for a page size below 1 (its next-page cursor would never move)."""
+    if page_size < 1:
+        raise ValueError(f"page_size must be at least 1 (got {page_size})")
+
+
+def page_footer(result_id: str, offset: int, page_size: int, total: int, unit: str) -> str:
+    """'Showing a-b of N' line plus the cursor of the next page, if any."""
+    end = min(offset + page_size, total)
+    footer = f"*Showing {unit} {offset + 1}-{end} of {total}.*"
+    if end < total:
+        footer += f" Next page: call again with `cursor=\"{make_cursor(result_id, end)}\"`."
+    return footer
+
+
+RESULTS = ResultStore()
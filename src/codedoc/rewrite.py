@@ -0,0 +1,258 @@
+"""
+Atomic multi-file rewriting with a rollback journal.
+
+Patched files are written concurrently, each through a temp file +
+``os.replace``. Before anything is replaced, the original bytes are copied to
+``<project>/.codedoc/journal/<id>/`` and listed in ``<id>.json``. A failed
+batch, or one interrupted by a crash, is rolled back from that copy.
+
+Crash recovery runs once per project and process, and never touches the
+journal of a batch that is still being committed (by this process or by
+another live one). A file is only put back while it still holds the patched
+(or original) bytes: anything edited since the batch is kept and reported.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from codedoc.cache import CACHE_DIR, cache_dir, write_json_atomic
+from codedoc.jobs import poll
+
+JOURNAL_DIR = "journal"
+
+# Concurrent writers of one batch.
+WRITE_WORKERS = 8
+
+_LIVE = set()        # ids of transactions committing in this process
+_RECOVERED = set()   # roots already recovered by this process
+_RECOVERY_LOCK = threading.Lock()
+
+
+class CommitFailed(RuntimeError):
+    """
+    A batch failed part-way and was rolled back.
+    - restored: files that had been written and were put back
+    - unrestored: files that could not be put back, or were edited meanwhile and kept
+    """
+
+    def __init__(self, cause: BaseException, restored: list, unrestored: list):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.restored = restored
+        self.unrestored = unrestored
+
+
+def journal_dir(root: str) -> str:
+    path = os.path.join(cache_dir(root), JOURNAL_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def patch_lines(path: str, line_numbers, patch) -> tuple:
+    """
+    Applies ``patch(line) -> line`` to the given 1-based lines of ``path`` only.
+    Lines are split on '\\n' alone, like the token index numbers them ('\\r' stays
+    part of the line ending). Returns (new_text, changed line numbers).
+    Raises UnicodeDecodeError for files that are not UTF-8 (they are never rewritten).
+    """
+    with open(path, 'rb') as f:
+        lines = f.read().decode('utf-8').split('\n')
+    changed = []
+    for line_num in sorted(set(line_numbers)):
+        if line_num > len(lines):
+            continue
+        line = lines[line_num - 1]
+        body = line[:-1] if line.endswith('\r') else line
+        healed = patch(body)
+        if healed != body:
+            lines[line_num - 1] = healed + line[len(body):]
+            changed.append(line_num)
+    return '\n'.join(lines), changed
+
+
+def _digest(path: str):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class Transaction:
+    """
+    One batch of file replacements.
+    ``stage()`` the new contents, then ``commit()``: either every file is
+    replaced or every file is restored.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.id = uuid.uuid4().hex[:12]
+        self._staged = {}
+
+    def stage(self, rel_path: str, text: str, stat=None):
+        """Queues ``text`` for ``rel_path``; ``stat`` (size, mtime_ns) guards against concurrent edits."""
+        self._staged[rel_path] = (text, stat)
+
+    def _write(self, rel: str):
+        text, expected = self._staged[rel]
+        path = os.path.join(self.root, rel)
+        if expected is not None:
+            st = os.stat(path)
+            if (st.st_size, st.st_mtime_ns) != expected:
+                raise RuntimeError(f"{rel} changed on disk while the patch was prepared")
+        tmp_path = f"{path}.{self.id}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def commit(self, workers: int = WRITE_WORKERS, job=None) -> list:
+        """
+        Journals the originals, then replaces the staged files concurrently.
+        Returns the written paths; on any failure (or cancellation) the written files are restored and the error re-raised.
+        """
+        if not self._staged:
+            return []
+        with _RECOVERY_LOCK:
+            _LIVE.add(self.id)
+        try:
+            return self._commit(workers, job)
+        finally:
+            with _RECOVERY_LOCK:
+                _LIVE.discard(self.id)
+
+    def _commit(self, workers: int, job) -> list:
+        journal = journal_dir(self.root)
+        backup_dir = os.path.join(journal, self.id)
+        os.makedirs(backup_dir)
+        entries = {}
+        for n, rel in enumerate(sorted(self._staged)):
+            backup = os.path.join(backup_dir, str(n))
+            shutil.copy2(os.path.join(self.root, rel), backup)
+            patched = hashlib.sha1(self._staged[rel][0].encode('utf-8')).hexdigest()
+            entries[rel] = {"backup": backup, "patched": patched}
+        manifest = os.path.join(journal, f"{self.id}.json")
+        write_json_atomic(manifest, {"id": self.id, "root": self.root, "pid": os.getpid(), "files": entries})
+
+        written, futures = [], {}
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                futures = {pool.submit(self._write, rel): rel for rel in sorted(self._staged)}
+                for done, (future, rel) in enumerate(futures.items()):
+                    poll(job, done, len(futures), "Writing patches")
+                    future.result()
+                    written.append(rel)
+        except BaseException as e:
+            # The pool has drained here, so no write can land after the restore
+            landed = [rel for future, rel in futures.items() if future.done() and not future.exception()]
+            restored, unrestored = rollback(manifest, landed)
+            if isinstance(e, Exception):
+                raise CommitFailed(e, restored, unrestored) from e
+            raise
+        _discard(manifest)
+        return written
+
+
+def rollback(manifest: str, only: list = None) -> tuple:
+    """
+    Restores the files listed in a journal manifest, but only those still holding
+    the patched bytes: a file that is back to its original needs nothing, and one
+    edited since the batch is kept as it is.
+    - only: Restore just these paths (the ones known to be written); default is all.
+    Returns (restored, kept) paths. The journal is deleted unless a restore failed.
+    """
+    with open(manifest, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    restored, kept, failed = [], [], False
+    for rel, entry in data["files"].items():
+        backup = entry["backup"]
+        if (only is not None and rel not in only) or not os.path.exists(backup):
+            continue
+        target = os.path.join(data["root"], rel)
+        current = _digest(target)
+        if current == _digest(backup):
+            continue
+        if current != entry["patched"]:
+            kept.append(rel)
+            continue
+        tmp_path = f"{target}.{data['id']}.rollback"
+        try:
+            shutil.copy2(backup, tmp_path)
+            os.replace(tmp_path, target)
+            restored.append(rel)
+        except OSError:
+            kept.append(rel)
+            failed = True
+    if not failed:
+        _discard(manifest)
+    return restored, kept
+
+
+def _discard(manifest: str):
+    shutil.rmtree(manifest[:-len(".json")], ignore_errors=True)
+    try:
+        os.remove(manifest)
+    except FileNotFoundError:
+        pass
+
+
+def _pid_alive(pid) -> bool:
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    if pid == os.getpid():
+        return False  # our own live batches are tracked in _LIVE
+    if os.name == 'nt':
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover(root: str) -> tuple:
+    """
+    Rolls back batches left half-written by a crash.
+    Runs once per project in this process; batches still committing are left alone.
+    Returns (restored, kept): files put back, and files left as they are because they were edited since.
+    """
+    root = os.path.abspath(root)
+    with _RECOVERY_LOCK:
+        if root in _RECOVERED:
+            return [], []
+        _RECOVERED.add(root)
+        journal = os.path.join(root, CACHE_DIR, JOURNAL_DIR)
+        if not os.path.isdir(journal):
+            return [], []
+        restored, kept = [], []
+        for name in sorted(os.listdir(journal)):
+            if not name.endswith(".json"):
+                continue
+            manifest = os.path.join(journal, name)
+            try:
+                with open(manifest, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get("id") in _LIVE or _pid_alive(data.get("pid")):
+                continue
+            batch_restored, batch_kept = rollback(manifest)
+            restored += batch_restored
+            kept += batch_kept
+        return restored, kept
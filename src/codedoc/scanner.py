@@ -0,0 +1,383 @@
+"""
+Compiled secret-detection engine.
+
+A rule set is compiled once into a single matcher that runs over the whole
+file buffer (memory-mapped for large files):
+- rules that start with known literals (``AKIA``, ``-----BEGIN``, ``password``...)
+  are located with plain ``bytes.find``, which is far faster than regex;
+- the remaining rules are joined into one combined alternation.
+Only lines where the matcher hits are decoded and re-checked with the original
+``str`` patterns, so a clean file costs one pass instead of rules x lines
+``re.search`` calls. Lines break on ``\n``, ``\r\n`` and bare ``\r`` (like text
+mode), so findings match a line-by-line ``str`` scan. The one exception: the
+byte-level prefilter folds case for ASCII only, so a Unicode look-alike
+spelling of an anchor literal (Kelvin sign for 'k', long s for 's') is missed.
+"""
+import bisect
+import hashlib
+import mmap
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from codedoc.jobs import poll
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+# Rules used by global_security_audit.
+AUDIT_RULES = {
+    "Cloud API Key": r"(AIzaSy[0-9A-Za-z-_]{33}|AKIA[0-9A-Z]{16})",
+    "Sensitive Variable": r"(?i)(password|secret|token|apikey|api_key|private_key)\s*[:=]\s*['\"].{8,}?['\"]",
+    "Connection String": r"(mongodb|postgres|mysql):\/\/[^\s'\"@]+:[^\s'\"@]+@[^\s'\"]+",
+    "Private Key": r"-----BEGIN [A-Z ]+ PRIVATE KEY-----"
+}
+
+# Rules used by guardian_scan.
+GUARDIAN_RULES = {
+    "Hardcoded Secret": r"(?i)(api[_-]?key|secret|token|passwd)[\s]*[:=][\s]*['\"][a-zA-Z0-9_\-\.]{10,}['\"]",
+    "Private Key": r"-----BEGIN [A-Z ]+ PRIVATE KEY-----",
+    "Connection String": r"(mongodb|postgres|mysql):\/\/[^\s'\"@]+:[^\s'\"@]+@[^\s'\"]+",
+}
+
+# Files larger than this are memory-mapped instead of read into memory.
+MMAP_THRESHOLD = 1 << 20
+
+# A NUL byte in the first SNIFF_BYTES marks the file as binary.
+SNIFF_BYTES = 8192
+
+# Memory-mapped buffers are searched for literals in windows of this size.
+CHUNK_BYTES = 32 << 20
+
+# Literal prefilters with more alternatives than this are not worth it.
+MAX_LITERALS = 64
+
+# Files handed to a worker process per task in parallel mode.
+BATCH_SIZE = 256
+
+_LEADING_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+
+def _scoped(pattern: str) -> str:
+    """Turns a leading global flag group like ``(?i)`` into a scoped ``(?i:...)`` group."""
+    match = _LEADING_FLAGS.match(pattern)
+    if match:
+        return f"(?{match.group(1)}:{pattern[match.end():]})"
+    return f"(?:{pattern})"
+
+
+_LINE_BREAK = re.compile(rb"\r\n?|\n")
+
+
+def newline_table(buf) -> list:
+    """Offsets just past every line break in ``buf``; ``bisect_right`` maps an offset to a line."""
+    return [m.end() for m in _LINE_BREAK.finditer(buf)]
+
+
+def _text_line(raw: bytes) -> str:
+    """One line as a text-mode read would yield it (undecodable bytes dropped, ending translated)."""
+    text = raw.decode("utf-8", "ignore")
+    if text.endswith("\r\n"):
+        return text[:-2] + "\n"
+    if text.endswith(("\r", "\n")):
+        return text[:-1] + "\n"
+    return text
+
+
+def _literal_prefixes(items) -> tuple:
+    """
+    Walks a parsed pattern and returns (prefixes, complete): the set of literal
+    strings every match must start with, and whether the whole sequence was literal.
+    """
+    prefixes = {""}
+    for op, av in items:
+        if op is sre_constants.LITERAL and av < 128:
+            prefixes = {p + chr(av) for p in prefixes}
+            continue
+
+        if op is sre_constants.SUBPATTERN and not av[1] and not av[2]:
+            options = [av[3]]
+        elif op is sre_constants.BRANCH:
+            options = av[1]
+        else:
+            return prefixes, False
+
+        complete = True
+        expanded = set()
+        for option in options:
+            sub, sub_complete = _literal_prefixes(option)
+            complete = complete and sub_complete
+            expanded.update(p + s for p in prefixes for s in sub)
+        prefixes = expanded
+        if len(prefixes) > MAX_LITERALS or not complete:
+            return prefixes, False
+    return prefixes, True
+
+
+def literal_anchors(pattern: str):
+    """
+    Returns (literals, ignore_case) such that every match of ``pattern`` starts
+    with one of ``literals``, or None when no useful literal set exists.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+    ignore_case = bool(parsed.state.flags & sre_constants.SRE_FLAG_IGNORECASE)
+    prefixes, _ = _literal_prefixes(list(parsed))
+    if not prefixes or len(prefixes) > MAX_LITERALS or min(map(len, prefixes)) < 2:
+        return None
+    literals = {p.lower() if ignore_case else p for p in prefixes}
+    return sorted(l.encode() for l in literals), ignore_case
+
+
+class RuleEngine:
+    """A rule set compiled for whole-buffer scanning."""
+
+    def __init__(self, rules: dict):
+        self.source = dict(rules)
+        self.rules = [(name, re.compile(pattern)) for name, pattern in rules.items()]
+        self.fingerprint = hashlib.sha1(repr(sorted(rules.items())).encode()).hexdigest()
+
+        self.literals, self.folded_literals = set(), set()
+        residual = []
+        for pattern in rules.values():
+            anchors = literal_anchors(pattern)
+            if anchors is None:
+                residual.append(pattern)
+            else:
+                (self.folded_literals if anchors[1] else self.literals).update(anchors[0])
+        self.overlap = max(map(len, self.literals | self.folded_literals), default=1) - 1
+        self.residual = re.compile(b"|".join(_scoped(p).encode() for p in residual)) if residual else None
+
+    def _hit_offsets(self, buf) -> list:
+        """Offsets where a rule may start matching."""
+        hits = []
+        size = len(buf)
+        chunked = isinstance(buf, mmap.mmap)
+        step = CHUNK_BYTES if chunked else max(size, 1)
+        for start in range(0, size, step):
+            window = buf[start:start + step + self.overlap] if chunked else buf
+            for literals, haystack in ((self.literals, window), (self.folded_literals, window.lower() if self.folded_literals else window)):
+                for literal in literals:
+                    i = haystack.find(literal)
+                    while i != -1 and i < step:
+                        hits.append(start + i)
+                        i = haystack.find(literal, i + 1)
+
+        if self.residual is not None:
+            pos = 0
+            while pos < size:
+                match = self.residual.search(buf, pos)
+                if match is None:
+                    break
+                hits.append(match.start())
+                end = _LINE_BREAK.search(buf, match.start())
+                pos = size if end is None else end.end()
+        return hits
+
+    def scan_buffer(self, buf) -> list:
+        """
+        Returns (line_num, rule_name) findings, in line then rule order.
+        Hit lines are re-checked as text, like a line-by-line scan.
+        """
+        hits = self._hit_offsets(buf)
+        if not hits:
+            return []
+
+        breaks = newline_table(buf)
+        size = len(buf)
+        findings = []
+        for line_idx in sorted({bisect.bisect_right(breaks, offset) for offset in hits}):
+            line_start = breaks[line_idx - 1] if line_idx else 0
+            line_end = breaks[line_idx] if line_idx < len(breaks) else size
+            line = _text_line(buf[line_start:line_end])
+            for name, rule in self.rules:
+                if rule.search(line):
+                    findings.append((line_idx + 1, name))
+        return findings
+
+    def scan_line(self, line: bytes) -> list:
+        """Names of the rules matching one line."""
+        text = _text_line(line)
+        return [name for name, rule in self.rules if rule.search(text)]
+
+    def scan_file(self, path: str, digest: bool = False):
+        """
+        Scans one file; binary or unreadable files yield no findings.
+        With ``digest`` returns (findings, sha1 of the scanned bytes) from the same read;
+        the sha1 is None for binary or unreadable files.
+        """
+        try:
+            with open(path, "rb") as f:
+                head = f.read(SNIFF_BYTES)
+                if b"\0" in head:
+                    return ([], None) if digest else []
+                if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                        findings = self.scan_buffer(buf)
+                        return (findings, hashlib.sha1(buf).hexdigest()) if digest else findings
+                buf = head + f.read()
+                findings = self.scan_buffer(buf)
+                return (findings, hashlib.sha1(buf).hexdigest()) if digest else findings
+        except (OSError, ValueError):
+            return ([], None) if digest else []
+
+
+# Object id of git's empty tree: the diff base of a repository without commits.
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+_HUNK_HEADER = re.compile(rb"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+_C_ESCAPES = {b"a": 7, b"b": 8, b"t": 9, b"n": 10, b"v": 11, b"f": 12, b"r": 13, b'"': 34, b"\\": 92}
+_QUOTED_CHAR = re.compile(rb'\\([0-7]{3}|.)|"', re.S)
+
+
+def diff_path(field: bytes):
+    """
+    Reads the path of a ``---``/``+++`` diff line (without the marker).
+    Git ends names containing spaces with a tab and C-quotes names with special
+    characters (``"b/q\\"uote.py"``, octal escapes for non-ASCII bytes).
+    Returns None when the field cannot be parsed.
+    """
+    field = field.rstrip(b"\r\n")
+    if not field.startswith(b'"'):
+        return field.rstrip(b"\t").decode("utf-8", "replace")
+
+    out = bytearray()
+    pos = 1
+    while True:
+        match = _QUOTED_CHAR.search(field, pos)
+        if match is None:
+            return None
+        out += field[pos:match.start()]
+        pos = match.end()
+        if match.group(0) == b'"':
+            break
+        escape = match.group(1)
+        if len(escape) == 3:
+            out.append(int(escape, 8))
+        elif escape in _C_ESCAPES:
+            out.append(_C_ESCAPES[escape])
+        else:
+            return None
+    if field[pos:].strip(b"\t"):
+        return None
+    return out.decode("utf-8", "replace")
+
+
+class HunkScanner:
+    """
+    Scans only the added lines of a ``git diff -U0`` stream, fed line by line.
+    The diff must be produced with ``--dst-prefix=b/`` so target paths can be
+    read back whatever the user's prefix settings. Findings are
+    (rel_path, new_line_num, rule_name) with line numbers of the new file version.
+    Hunks whose target path could not be read are counted in ``unparsed_hunks``.
+    """
+
+    def __init__(self, engine: RuleEngine, suffixes: tuple):
+        self.engine = engine
+        self.suffixes = suffixes
+        self.findings = []
+        self.files = set()
+        self.added_lines = 0
+        self.unparsed_hunks = 0
+        self._path = None
+        self._known = False
+        self._line = 0
+        self._in_hunk = False
+
+    def feed(self, raw: bytes):
+        if raw.startswith(b"diff --git "):
+            self._path, self._known, self._in_hunk = None, False, False
+            return
+
+        header = _HUNK_HEADER.match(raw)
+        if header:
+            self._in_hunk = True
+            self._line = int(header.group(1))
+            if not self._known:
+                self.unparsed_hunks += 1
+            return
+
+        if not self._in_hunk:
+            if raw.startswith(b"+++ "):
+                target = diff_path(raw[4:])
+                if target == "/dev/null":
+                    self._path, self._known = None, True
+                elif target is not None and target.startswith("b/"):
+                    target = target[2:]
+                    self._path, self._known = (target if target.endswith(self.suffixes) else None), True
+            return
+
+        if raw.startswith(b"+"):
+            if self._path is not None:
+                self.files.add(self._path)
+                self.added_lines += 1
+                for name in self.engine.scan_line(raw[1:]):
+                    self.findings.append((self._path, self._line, name))
+            self._line += 1
+        elif raw.startswith(b" "):
+            self._line += 1
+
+    def feed_all(self, lines: list, job=None):
+        """Feeds a batch of diff lines (worker-thread side of a streamed diff)."""
+        for n, raw in enumerate(lines):
+            if not n & 1023:
+                poll(job)
+            self.feed(raw)
+
+
+_WORKER_ENGINES = {}
+
+# Start method of scan worker processes ("spawn" where forkserver is unavailable, e.g. Windows).
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _scan_batch(rules: dict, digest: bool, paths: list) -> list:
+    """Process-pool task: scans a batch with an engine compiled once per worker."""
+    key = repr(sorted(rules.items()))
+    engine = _WORKER_ENGINES.get(key)
+    if engine is None:
+        engine = _WORKER_ENGINES[key] = RuleEngine(rules)
+    return [engine.scan_file(path, digest) for path in paths]
+
+
+def scan_files(engine: RuleEngine, paths: list, workers: int = 1, job=None, digest: bool = False) -> list:
+    """
+    Scans ``paths`` and returns one findings list per path, in input order.
+    - workers: 1 scans serially, 0 uses every core, N uses N processes.
+    - digest: Return (findings, sha1) pairs instead, hashed from the scanned buffer.
+    Batches are merged back in submission order, so the result is identical
+    to the serial scan whatever the worker count.
+    """
+    total = len(paths)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or total <= BATCH_SIZE:
+        results = []
+        for done, path in enumerate(paths):
+            poll(job, done, total, "Scanning files")
+            results.append(engine.scan_file(path, digest))
+        return results
+
+    batches = [paths[i:i + BATCH_SIZE] for i in range(0, total, BATCH_SIZE)]
+    results = []
+    # Never fork: the server is multi-threaded (to_thread workers, SQLite connections) and a forked child can deadlock
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(batches)), mp_context=multiprocessing.get_context(_START_METHOD))
+    try:
+        for batch in pool.map(_scan_batch, repeat(engine.source), repeat(digest), batches):
+            results.extend(batch)
+            poll(job, len(results), total, "Scanning files")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+AUDIT_ENGINE = RuleEngine(AUDIT_RULES)
+GUARDIAN_ENGINE = RuleEngine(GUARDIAN_RULES)
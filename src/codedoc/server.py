@@ -1,60 +1,99 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 import os
+import re
 import sys
 from datetime import datetime
 
+from codedoc.audits import AUDITS, changed_regions, worth_delta
+from codedoc.cache import file_digest, get_findings_cache
+from codedoc.contracts import CONTRACT_EXTS, TABLES, blob_hash, classify
+from codedoc.depgraph import get_dependency_graph
+from codedoc.docstore import get_doc_store, source_key, text_digest
+from codedoc.index import get_index
+from codedoc.jobs import poll, run_blocking, run_git, stream_git
+from codedoc.results import RESULTS, check_offset, check_page_size, make_cursor, page_footer, parse_cursor
+from codedoc.rewrite import CommitFailed, Transaction, patch_lines, recover
+from codedoc.scanner import AUDIT_ENGINE, EMPTY_TREE, GUARDIAN_ENGINE, HunkScanner
+from codedoc.slicing import build_slice
+from codedoc.stats import STATS, count, instrument, render_stats
+from codedoc.symbols import get_token_index
+
 mcp = FastMCP("CodeDoc", log_level="ERROR")
 
-IGNORE_DIRS = {'node_modules', '.git', '__pycache__', 'venv', '.env', 'dist', 'build'}
+
+def _read_source(path: str, job=None) -> str:
+    """Blocking file read, meant to be run through run_blocking()."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    count("bytes_read", len(text))
+    return text
+
+
+def _walk_target(full_path: str, job=None) -> list:
+    """Every file below a folder the user named, skipping only hidden folders, node_modules and venv."""
+    found = []
+    for root, dirs, files in os.walk(full_path):
+        poll(job)
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ('node_modules', 'venv')]
+        found.extend(os.path.join(root, f) for f in files)
+    return found
+
+
+# Extensions listed by scan_project_files (and expected to have docs).
+DOC_EXTS = ('.py', '.js', '.ts', '.java', '.cpp', '.cs')
+
+
+def _doc_markdown(display_name: str, doc_content: str, audit_results: str) -> str:
+    content = f"# Technical Audit & Docs: {display_name}\n"
+    content += f"*Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n\n"
+    content += f"## 1. Documentation\n{doc_content}\n\n"
+    content += f"## 2. Quality Audit\n{audit_results}\n\n"
+    return content
+
 
 @mcp.tool()
-def generate_smart_doc(doc_content: str, audit_results: str, code_snippet: str = None, file_path: str = None, language: str = "auto") -> str:
+@instrument
+def generate_smart_doc(doc_content: str, audit_results: str, code_snippet: str = None, file_path: str = None, language: str = "auto", force: bool = False) -> str:
     """
     Universal tool for documentation and audits.
     - file_path: Path to local file.
     - code_snippet: Pasted code from chat.
+    - force: Rewrite the doc even when the source has not changed since it was last documented.
+    Docs are stored per source version (documentation/index.json tracks the current one).
     """
     try:
         # 1. SETUP TARGET DIRECTORY
         cwd = os.getcwd()
         base_path = cwd if (cwd and cwd != "/") else os.path.dirname(os.path.abspath(__file__))
-        
-        target_folder = os.path.join(base_path, "documentation")
-        os.makedirs(target_folder, exist_ok=True)
+        store = get_doc_store(base_path)
 
         display_name = ""
-        final_code = ""
 
         if file_path:
             full_file_path = file_path if os.path.isabs(file_path) else os.path.join(base_path, file_path)
             
             if not os.path.exists(full_file_path):
                 return f"Error: File not found at {full_file_path}"
-                
-            with open(full_file_path, "r", encoding="utf-8") as f:
-                final_code = f.read()
+
+            # Only the content hash is needed: the source itself is not copied into the doc
+            key = source_key(base_path, full_file_path)
+            version = file_digest(full_file_path)
             display_name = os.path.basename(file_path)
             
         elif code_snippet:
-            final_code = code_snippet
+            version = text_digest(code_snippet)
+            key = "snippet"
             display_name = "snippet"
         else:
             return "Error: Provide either 'file_path' or 'code_snippet'."
 
-        # 2. Create the output file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"documentation_{display_name.replace('.', '_')}_{timestamp}.md"
-        full_path = os.path.join(target_folder, filename)
-
-        # 3. Build Markdown
-        content = f"# Technical Audit & Docs: {display_name}\n"
-        content += f"*Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n\n"
-        content += f"## 1. Documentation\n{doc_content}\n\n"
-        content += f"## 2. Quality Audit\n{audit_results}\n\n"
-        # content += f"## 3. Source Code\n```{language}\n{final_code}\n```"
+        # 2. Build Markdown
+        content = _doc_markdown(display_name, doc_content, audit_results)
 
-        with open(full_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        # 3. Store it (no-op when this source version is already documented)
+        full_path, written = store.put(key, version, content, force)
+        if not written:
+            return f"Up to date: `{display_name}` has not changed since it was documented at: {full_path}"
 
         return f"Successfully generated at: {full_path}"
 
@@ -63,44 +102,98 @@ def generate_smart_doc(doc_content: str, audit_results: str, code_snippet: str =
         return f"System Error: {str(e)}"
 
 @mcp.tool()
-def scan_project_files() -> list:
+@instrument
+async def generate_smart_docs(entries: list[dict], force: bool = False, max_workers: int = 8, ctx: Context = None) -> str:
+    """
+    Batch version of generate_smart_doc: documents many files in one call.
+    - entries: [{"file_path": ..., "doc_content": ..., "audit_results": ...}, ...]
+    - force: Rewrite docs even for sources unchanged since they were documented.
+    - max_workers: Docs written at the same time.
+    Also lists the project files that still have no documentation.
+    """
+    cwd = os.getcwd()
+    base_path = cwd if (cwd and cwd != "/") else os.path.dirname(os.path.abspath(__file__))
+    store = get_doc_store(base_path)
+
+    def run(job):
+        # 1. Validate every entry up front
+        items, keys, errors = [], [], []
+        for n, entry in enumerate(entries, 1):
+            poll(job, n - 1, len(entries), "Validating entries")
+            file_path = entry.get("file_path") if isinstance(entry, dict) else None
+            if not file_path or "doc_content" not in entry:
+                errors.append(f"- Entry {n}: needs 'file_path' and 'doc_content'")
+                continue
+            full_file_path = file_path if os.path.isabs(file_path) else os.path.join(base_path, file_path)
+            if not os.path.isfile(full_file_path):
+                errors.append(f"- Entry {n}: file not found at {full_file_path}")
+                continue
+            key = source_key(base_path, full_file_path)
+            content = _doc_markdown(os.path.basename(file_path), entry["doc_content"], entry.get("audit_results", ""))
+            items.append((key, file_digest(full_file_path), content))
+            keys.append(key)
+
+        # 2. Concurrent writes, one manifest update
+        results = store.put_many(items, force, max_workers)
+
+        # 3. Cross-reference with scan_project_files
+        documented = store.documented()
+        missing = [rel for rel in get_index(base_path).files(DOC_EXTS) if rel.replace(os.sep, "/") not in documented]
+        return keys, results, errors, missing
+
+    keys, results, errors, missing = await run_blocking(run, ctx=ctx)
+
+    written = [k for k, (_, ok, _) in zip(keys, results) if ok]
+    unchanged = [k for k, (path, ok, err) in zip(keys, results) if not ok and not err]
+    errors += [f"- `{k}`: {err}" for k, (_, _, err) in zip(keys, results) if err]
+
+    report = "## Batch Documentation Summary\n"
+    report += f"**{len(written)}** written, **{len(unchanged)}** unchanged, **{len(errors)}** failed.\n"
+    if written:
+        report += "\n### Written\n" + "\n".join(f"- `{k}`" for k in written) + "\n"
+    if unchanged:
+        report += "\n### Up to date (source unchanged)\n" + "\n".join(f"- `{k}`" for k in unchanged) + "\n"
+    if errors:
+        report += "\n### Failed\n" + "\n".join(errors) + "\n"
+    if missing:
+        report += f"\n### Still undocumented ({len(missing)} files)\n" + "\n".join(f"- `{rel}`" for rel in missing[:50])
+        if len(missing) > 50:
+            report += f"\n- ... and {len(missing) - 50} more"
+    else:
+        report += "\n✅ Every project source file has documentation."
+    return report
+
+@mcp.tool()
+@instrument
+async def scan_project_files(ctx: Context = None) -> list:
     """Returns a list of all documentable source files in the current project root."""
-    documentable = []
     cwd = os.getcwd()
     base_path = cwd if (cwd and cwd != "/") else os.path.dirname(os.path.abspath(__file__))
-    
-    for root, dirs, files in os.walk(base_path):
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-        for file in files:
-            if file.endswith(('.py', '.js', '.ts', '.java', '.cpp', '.cs')):
-                rel_path = os.path.relpath(os.path.join(root, file), base_path)
-                documentable.append(rel_path)
-    return documentable
+    index = get_index(base_path)
+    return await run_blocking(lambda job: index.files(DOC_EXTS), ctx=ctx)
 
 # Refactoring & Optimization
 @mcp.tool()
-async def refactor_and_optimize(file_path: str, custom_rules: str = "") -> str:
+@instrument
+async def refactor_and_optimize(file_path: str, custom_rules: str = "", symbol: str = None, line_range: str = None, max_tokens: int = 0, ctx: Context = None) -> str:
     """
     Refactors and optimizes code. 
     Handles case-insensitivity and deep path discovery.
+    For large files, send only what matters (the file outline is always included):
+    - symbol: Class/function/method to refactor (e.g. 'fetchData' or 'ApiClient.fetchData').
+    - line_range: 'start-end' lines to refactor; the enclosing units are sent.
+    - max_tokens: Approximate size budget for the code sent back.
     """
     import os
 
     # 1. FORCE THE CORRECT PROJECT ROOT
     # We look at the current working directory but prioritize the actual file name
     project_root = os.path.abspath(".")
-    target_filename = os.path.basename(file_path).lower() # Case-insensitive
     resolved_path = None
-    matches = []
 
-    # 2. AGGRESSIVE SEARCH
-    for root, dirs, files in os.walk(project_root):
-        # Security: Prune restricted folders
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['venv', 'node_modules', 'Library']]
-        
-        for f in files:
-            if f.lower() == target_filename:
-                matches.append(os.path.join(root, f))
+    # 2. AGGRESSIVE SEARCH (case-insensitive basename map, partial paths narrow it down)
+    index = get_index(project_root)
+    matches = [index.abspath(rel) for rel in await run_blocking(lambda job: index.resolve(file_path), ctx=ctx)]
 
     # 3. SMART PATH SELECTION
     if not matches:
@@ -108,14 +201,15 @@ async def refactor_and_optimize(file_path: str, custom_rules: str = "") -> str:
         
     if len(matches) > 1:
         rel_paths = [os.path.relpath(m, project_root) for m in matches]
-        return f"Multiple matches found. Which one should I refactor?\n" + "\n".join([f"- {p}" for p in rel_paths])
+        return "Multiple matches found. Which one should I refactor?\n" + "\n".join([f"- {p}" for p in rel_paths])
     
     resolved_path = matches[0]
 
     # 4. EXECUTE REFACTOR
     try:
-        with open(resolved_path, "r", encoding="utf-8") as f:
-            code_content = f.read()
+        code_content = await run_blocking(_read_source, resolved_path, ctx=ctx)
+        if symbol or line_range or max_tokens:
+            code_content = await run_blocking(build_slice, resolved_path, code_content, symbol, line_range, max_tokens, ctx=ctx)
 
         # Build a robust AI Prompt
         return f"""
@@ -129,39 +223,55 @@ async def refactor_and_optimize(file_path: str, custom_rules: str = "") -> str:
         {code_content}
         ---
         
-        INSTRUCTION: Provide the refactored code block only. Cursor will help the user apply changes.
+        INSTRUCTION: Provide the refactored code block only (for a sliced file, only the selected units). Cursor will help the user apply changes.
         """
+    except ValueError as e:
+        return f"Error: {str(e)}"
     except Exception as e:
         return f"Access Error: {str(e)}"
 
 # Health Audit and Refactoring
 @mcp.tool()
-async def evaluate_and_refactor(file_path: str, custom_rules: str = "") -> str:
+@instrument
+async def evaluate_and_refactor(file_path: str, custom_rules: str = "", symbol: str = None, line_range: str = None, max_tokens: int = 0, delta: bool = False, ctx: Context = None) -> str:
     """
     Language-agnostic --- health audit AND generates optimized code.
+    - symbol / line_range / max_tokens: Audit only the matching units of a large
+      file, within a size budget (the file outline is always included).
+    - delta: Re-audit only what changed since the last audit of this file, starting
+      from the report saved with record_audit_report. Falls back to a full audit
+      when there is no previous audit or most of the file changed.
     """
     import os
 
     # 1. SEARCH
     project_root = os.path.abspath(os.getcwd())
     target_name = os.path.basename(file_path)
-    resolved_path = None
 
-    for root, dirs, files in os.walk(project_root):
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', 'venv', 'bin', 'obj']]
-        if target_name in files:
-            resolved_path = os.path.join(root, target_name)
-            break
+    index = get_index(project_root)
+    matches = await run_blocking(lambda job: index.resolve(file_path), ctx=ctx)
 
-    if not resolved_path:
+    if not matches:
         return f"Error: Could not find '{target_name}' in the project."
 
+    if len(matches) > 1:
+        return "Multiple matches found. Which one should I audit?\n" + "\n".join([f"- {p}" for p in matches])
+
+    resolved_path = index.abspath(matches[0])
+
     # 2. FILE METADATA
     ext = os.path.splitext(resolved_path)[1].lower()
     
     try:
-        with open(resolved_path, "r", encoding="utf-8") as f:
-            code_content = f.read()
+        code_content = await run_blocking(_read_source, resolved_path, ctx=ctx)
+        if symbol or line_range or max_tokens:
+            code_content = await run_blocking(build_slice, resolved_path, code_content, symbol, line_range, max_tokens, ctx=ctx)
+        else:
+            if delta:
+                prompt = await run_blocking(_delta_audit, resolved_path, project_root, code_content, custom_rules, ctx=ctx)
+                if prompt:
+                    return prompt
+            AUDITS.remember(resolved_path, code_content)
 
         # 3. UNIFIED ARCHITECT PROMPT
         return f"""
@@ -189,143 +299,367 @@ async def evaluate_and_refactor(file_path: str, custom_rules: str = "") -> str:
         3. Provide the refactored code in a standard markdown block. 
            (Note: Cursor will automatically detect this and show the 'Apply' button).
         4. End with a "## 🏁 Final Verdict" explaining why this version is production-ready.
+        5. Finally call `record_audit_report` with file_path and the Code Health Report,
+           so the next audit of this file can run in delta mode.
         """
+    except ValueError as e:
+        return f"Error: {str(e)}"
     except Exception as e:
         return f"Processing Error: {str(e)}"
 
+
+def _delta_audit(resolved_path: str, project_root: str, code_content: str, custom_rules: str, job=None):
+    """Delta prompt against the last reported audit, or None when a full audit is needed."""
+    entry = AUDITS.get(resolved_path)
+    if entry is None or entry.report is None:
+        count("delta_misses")
+        return None
+
+    rel_path = os.path.relpath(resolved_path, project_root)
+    if code_content == entry.base:
+        count("delta_unchanged")
+        return f"✅ **{rel_path}** is unchanged since its last audit.\n\n{entry.report}"
+
+    regions, changed = changed_regions(entry.base, code_content)
+    if not worth_delta(changed, code_content):
+        count("delta_too_large")
+        return None
+
+    count("delta_audits")
+    count("delta_chars_saved", max(len(code_content) - len(regions) - len(entry.report), 0))
+    AUDITS.remember(resolved_path, code_content)
+    return f"""
+        ROLE: Senior Multi-Language Architect
+        TASK: Re-audit the CHANGED REGIONS of {rel_path} and update its previous Health Report.
+
+        FILE_PATH: {rel_path}
+        CHANGED LINES: {changed} of {code_content.count(chr(10)) + 1}
+
+        --- PREVIOUS HEALTH REPORT ---
+        {entry.report}
+
+        --- CHANGED REGIONS ---
+        Numbers are lines of the current file; '+' lines are new or edited, '-' lines were removed,
+        the rest is unchanged context. Everything outside these regions is exactly as previously audited.
+        ---
+        {regions}
+        ---
+
+        --- STEP 1: DELTA AUDIT ---
+        Keep previous findings about untouched code; drop findings the edit resolved;
+        add findings the edit introduced (SOLID, OOPS, language best practices). Re-score (1-10).
+
+        --- STEP 2: OPTIMIZATION ---
+        Refactor only the changed regions (and code they directly break).
+        USER RULES: {custom_rules if custom_rules else "Apply standard high-quality optimizations."}
+
+        OUTPUT FORMAT REQUIREMENT:
+        1. Start with the updated "## Code Health Report" section (Score, Findings, Risk),
+           marking findings as Resolved / New / Unchanged.
+        2. Then provide the "##  Optimized Code" section as edits to the changed regions, by line number.
+        3. End with a "## 🏁 Final Verdict".
+        4. Finally call `record_audit_report` with file_path and the updated Code Health Report.
+        """
+
+
+@mcp.tool()
+@instrument
+async def record_audit_report(file_path: str, report: str, ctx: Context = None) -> str:
+    """
+    Saves the Code Health Report of the last evaluate_and_refactor call on file_path,
+    so the next call with delta=True only needs to send what changed since.
+    """
+    project_root = os.path.abspath(os.getcwd())
+    index = get_index(project_root)
+    matches = await run_blocking(lambda job: index.resolve(file_path), ctx=ctx)
+    if len(matches) != 1:
+        return f"Error: '{file_path}' must match exactly one file (found {len(matches)})."
+    if not AUDITS.record_report(index.abspath(matches[0]), report):
+        return f"⚠️ No recent audit of {matches[0]} to attach this report to. Run evaluate_and_refactor first."
+    return f"✅ Health report saved for {matches[0]}. The next audit can use delta=True."
+
 # impact analysis
+IMPACT_EXTS = {'.ts', '.tsx', '.js', '.py', '.java', '.cs', '.cpp', '.h'}
+
+
 @mcp.tool()
-async def predict_impact(file_path: str, symbol: str = None) -> str:
+@instrument
+async def predict_impact(file_path: str, symbol: str = None, cursor: str = None, page_size: int = 5, transitive: bool = False, max_depth: int = 3, ctx: Context = None) -> str:
     """
     Analyzes the impact of changing a specific symbol (variable, function, or class).
     If no symbol is provided, it analyzes dependencies on the file itself.
+    - cursor: Returned by a previous call; fetches the next page of affected files without rescanning.
+    - page_size: Number of affected files listed per page.
+    - transitive: Instead of text references, walk the import graph: every file that
+      imports file_path directly or through other files, ranked by distance.
+    - max_depth: Import hops followed in transitive mode (0 = unlimited).
+    Symbol lookups may miss a file edited in place in the last 30 seconds
+    (see codedoc.symbols); heal_dependency_calls always re-checks every file.
     """
     import os
     # import re
 
     project_root = os.path.abspath(os.getcwd())
     target_name = os.path.basename(file_path)
+
+    try:
+        check_page_size(page_size)
+    except ValueError as e:
+        return f"Error: {e}"
+    stored = None
+    if cursor:
+        try:
+            stored = RESULTS.get(parse_cursor(cursor)[0], ("impact", "blast-radius"))
+        except ValueError as e:
+            return f"Error: {e}"
+    if transitive or (stored is not None and stored[0][0] == "blast-radius"):
+        return await _transitive_impact(project_root, file_path, cursor, page_size, max_depth, ctx)
     
     # If the user says "rename fetchData", symbol will be "fetchData"
     # If no symbol, we default to the file name (base_name)
     search_query = symbol if symbol else os.path.splitext(target_name)[0]
     
-    impacted_locations = []
-    ALLOWED_EXTS = {'.ts', '.tsx', '.js', '.py', '.java', '.cs', '.cpp', '.h'}
-
-    for root, dirs, files in os.walk(project_root):
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', 'dist', 'bin']]
-        
-        for file in files:
-            if os.path.splitext(file)[1].lower() not in ALLOWED_EXTS:
-                continue
-            
-            full_path = os.path.join(root, file)
-            try:
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    # Search line-by-line to give the user exact line numbers
-                    for i, line in enumerate(f, 1):
-                        if search_query in line:
-                            rel_path = os.path.relpath(full_path, project_root)
-                            impacted_locations.append(f"{rel_path} (Line {i})")
-            except:
-                continue
-
-    if not impacted_locations:
+    # Later pages come straight from the stored result set
+    rows, offset = None, 0
+    if cursor:
+        result_id, offset = parse_cursor(cursor)
+        if stored is not None:
+            (_, _, search_query), rows = stored
+
+    if rows is None:
+        # Whole-identifier lookup in the shared inverted index (no repository re-read)
+        # Opening the index loads its file table from SQLite: keep it off the event loop too
+        locations = await run_blocking(lambda job: get_token_index(project_root).find(search_query, job=job), ctx=ctx)
+        rows = [(rel_path, i) for rel_path, i in locations if os.path.splitext(rel_path)[1].lower() in IMPACT_EXTS]
+        result_id = RESULTS.put(("impact", project_root, search_query), rows)
+
+    if not rows:
         return f" No external references to `{search_query}` found. Change appears safe."
 
     # deduplicate and format
-    unique_files = list(set([loc.split(' (')[0] for loc in impacted_locations]))
+    unique_files = list(dict.fromkeys(rel_path for rel_path, _ in rows))
+    try:
+        check_offset(offset, len(unique_files))
+    except ValueError as e:
+        return f"Error: {e}"
     
     report = f"## Impact Analysis for `{search_query}`\n"
-    report += f"Found **{len(impacted_locations)}** references in **{len(unique_files)}** files.\n\n"
-    report += "**Affected Files:**\n" + "\n".join([f"- {f}" for f in unique_files[:5]])
+    report += f"Found **{len(rows)}** references in **{len(unique_files)}** files.\n\n"
+    report += "**Affected Files:**\n" + "\n".join([f"- {f}" for f in unique_files[offset:offset + page_size]])
     
-    if len(unique_files) > 5:
-        report += f"\n...and {len(unique_files)-5} more files."
+    if len(unique_files) > page_size or offset:
+        report += "\n" + page_footer(result_id, offset, page_size, len(unique_files), "files")
         
     report += "\n\n**Architect Note:** Changing this symbol will break these references. Ensure you use a 'Global Rename' or update these call-sites."
     return report
 
+async def _transitive_impact(project_root: str, file_path: str, cursor: str, page_size: int, max_depth: int, ctx: Context = None) -> str:
+    """predict_impact(transitive=True): dependents of a file from the import graph, ranked by distance."""
+    rows, offset = None, 0
+    if cursor:
+        try:
+            result_id, offset = parse_cursor(cursor)
+            stored = RESULTS.get(result_id, ("blast-radius",))
+        except ValueError as e:
+            return f"Error: {e}"
+        if stored is not None:
+            (_, _, target, max_depth), rows = stored
+
+    if rows is None:
+        index = get_index(project_root)
+        matches = await run_blocking(lambda job: index.resolve(file_path), ctx=ctx)
+        if not matches:
+            return f"Error: Could not find '{file_path}' in the project."
+        if len(matches) > 1:
+            return "Multiple matches found. Which one should I analyze?\n" + "\n".join(f"- {p}" for p in matches)
+        target = matches[0]
+        rows = await run_blocking(get_dependency_graph(project_root).dependents, target, max_depth, ctx=ctx)
+        result_id = RESULTS.put(("blast-radius", project_root, target, max_depth), rows)
+
+    depth_note = f"up to {max_depth} hops" if max_depth > 0 else "all hops"
+    if not rows:
+        return f" Nothing imports `{target}` ({depth_note}). Change appears safe."
+
+    try:
+        check_offset(offset, len(rows))
+    except ValueError as e:
+        return f"Error: {e}"
+    direct = sum(1 for _, distance in rows if distance == 1)
+    report = f"## Transitive Impact of `{target}`\n"
+    report += f"**{len(rows)}** dependent files ({direct} direct, {depth_note}).\n\n"
+    report += "**Affected Files (by distance):**\n"
+    report += "\n".join(f"- [{distance}] {rel}" for rel, distance in rows[offset:offset + page_size])
+    if len(rows) > page_size or offset:
+        report += "\n" + page_footer(result_id, offset, page_size, len(rows), "files")
+    report += "\n\n**Architect Note:** Distance 1 files import it directly; higher distances break only if the change propagates through their imports."
+    return report
+
+
+@mcp.tool()
+@instrument
+async def predict_impact_batch(symbols: list[str], page_size: int = 5, ctx: Context = None) -> str:
+    """
+    Impact analysis for many symbols at once (e.g. everything inspect_contract_change reported).
+    The project is read once for all of them instead of once per predict_impact call.
+    - symbols: Symbol names (or call fragments like 'api.fetch(').
+    - page_size: Affected files listed per symbol; the rest are paged through predict_impact's cursor.
+    """
+    import os
+
+    project_root = os.path.abspath(os.getcwd())
+    symbols = [s for s in dict.fromkeys(symbols) if s and s.strip()]
+    if not symbols:
+        return "Error: Provide at least one symbol."
+    try:
+        check_page_size(page_size)
+    except ValueError as e:
+        return f"Error: {e}"
+
+    found = await run_blocking(lambda job: get_token_index(project_root).find_many(symbols, job=job), ctx=ctx)
+
+    report = f"## Batch Impact Analysis ({len(symbols)} symbols)\n"
+    safe = []
+    for symbol in symbols:
+        rows = [(rel, i) for rel, i in found[symbol] if os.path.splitext(rel)[1].lower() in IMPACT_EXTS]
+        if not rows:
+            safe.append(symbol)
+            continue
+        # Same result set predict_impact would build, so its cursor pages through the rest
+        result_id = RESULTS.put(("impact", project_root, symbol), rows)
+        unique_files = list(dict.fromkeys(rel for rel, _ in rows))
+        report += f"\n### `{symbol}`\nFound **{len(rows)}** references in **{len(unique_files)}** files.\n"
+        report += "\n".join(f"- {f}" for f in unique_files[:page_size])
+        if len(unique_files) > page_size:
+            report += f"\n*...and {len(unique_files) - page_size} more. Next page: `predict_impact(file_path=\"{symbol}\", cursor=\"{make_cursor(result_id, page_size)}\")`.*"
+        report += "\n"
+
+    if safe:
+        report += "\n**No references (change appears safe):** " + ", ".join(f"`{s}`" for s in safe)
+    return report
+
 # security scan
 @mcp.tool()
-async def global_security_audit() -> str:
+@instrument
+async def global_security_audit(workers: int = 1, cursor: str = None, page_size: int = 15, ctx: Context = None) -> str:
     """
     Scans the ENTIRE project for secrets, keys, and vulnerabilities.
     Use this before pushing code to GitHub/GitLab.
+    - workers: Processes to scan with (1 = serial, 0 = all CPU cores).
+    - cursor: Returned by a previous call; fetches the next page of findings without rescanning.
+    - page_size: Number of findings listed per page.
     """
     import os
-    import re
 
     project_root = os.path.abspath(os.getcwd())
-    
-    # Define what we are looking for
-    RULES = {
-        "Cloud API Key": r"(AIzaSy[0-9A-Za-z-_]{33}|AKIA[0-9A-Z]{16})",
-        "Sensitive Variable": r"(?i)(password|secret|token|apikey|api_key|private_key)\s*[:=]\s*['\"].{8,}?['\"]",
-        "Connection String": r"(mongodb|postgres|mysql):\/\/[^\s'\"@]+:[^\s'\"@]+@[^\s'\"]+",
-        "Private Key": r"-----BEGIN [A-Z ]+ PRIVATE KEY-----"
-    }
-
-    critical_findings = []
-    
-    # Walk through every file in the project
-    for root, dirs, files in os.walk(project_root):
-        # SKIP heavy/irrelevant folders
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', 'venv', 'dist', 'build']]
-        
-        for file in files:
-            # Only scan code files
-            if not file.endswith(('.ts', '.tsx', '.js', '.py', '.java', '.cs', '.cpp', '.h', '.env', '.yaml', '.yml')):
-                continue
-                
-            file_path = os.path.join(root, file)
-            try:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    for line_num, line in enumerate(f, 1):
-                        for name, pattern in RULES.items():
-                            if re.search(pattern, line):
-                                rel_path = os.path.relpath(file_path, project_root)
-                                critical_findings.append(f"📁 `{rel_path}` | Line {line_num}: **{name}**")
-            except:
-                continue
+    try:
+        check_page_size(page_size)
+    except ValueError as e:
+        return f"Error: {e}"
+
+    def scan(job):
+        # Every code file in the project (heavy/irrelevant folders are pruned by the index)
+        index = get_index(project_root)
+        rel_paths = index.files(('.ts', '.tsx', '.js', '.py', '.java', '.cs', '.cpp', '.h', '.env', '.yaml', '.yml'))
+
+        # One compiled pass over each changed file (binaries are skipped), optionally across processes;
+        # unchanged files are served from the on-disk findings cache
+        cache = get_findings_cache(project_root, AUDIT_ENGINE)
+        return (rel_paths, *cache.scan([index.abspath(p) for p in rel_paths], workers, job))
+
+    # Later pages come straight from the stored result set
+    critical_findings, offset, cache_note = None, 0, "*Served from the previous scan*"
+    if cursor:
+        try:
+            result_id, offset = parse_cursor(cursor)
+            stored = RESULTS.get(result_id, ("audit",))
+        except ValueError as e:
+            return f"Error: {e}"
+        if stored is not None:
+            critical_findings = stored[1]
+
+    if critical_findings is None:
+        rel_paths, results, hits, misses = await run_blocking(scan, ctx=ctx)
+        cache_note = f"*Cache: {hits} hits / {misses} misses*"
+        critical_findings = [
+            (rel_path, line_num, name)
+            for rel_path, file_findings in zip(rel_paths, results)
+            for line_num, name in file_findings
+        ]
+        result_id = RESULTS.put(("audit", project_root), critical_findings)
 
     if not critical_findings:
-        return "**Project Scan Complete:** No secrets found. You are safe to push!"
+        return f"**Project Scan Complete:** No secrets found. You are safe to push!\n{cache_note}"
+
+    try:
+        check_offset(offset, len(critical_findings))
+    except ValueError as e:
+        return f"Error: {e}"
 
-    # 3. FORMAT THE REPORT
+    # 3. FORMAT THE REPORT (one page at a time to prevent text overflow)
     report = "## Global Security Audit Results\n"
-    report += f"Found **{len(critical_findings)}** potential security leaks:\n\n"
-    report += "\n".join(critical_findings[:15]) # Cap at 15 to prevent text overflow
+    report += f"Found **{len(critical_findings)}** potential security leaks:\n{cache_note}\n\n"
+    report += "\n".join(
+        f"📁 `{rel_path}` | Line {line_num}: **{name}**"
+        for rel_path, line_num, name in critical_findings[offset:offset + page_size]
+    )
     
-    if len(critical_findings) > 15:
-        report += f"\n\n...and {len(critical_findings) - 15} more leaks."
+    if len(critical_findings) > page_size or offset:
+        report += "\n\n" + page_footer(result_id, offset, page_size, len(critical_findings), "leaks")
         
     report += "\n\n**Action Required:** Neutralize these secrets or move them to a `.gitignore`'d environment file."
     return report
 
+# Diff lines handed to the hunk scanner's worker thread at a time.
+DIFF_BATCH_LINES = 4096
+
 # Scan Uncommitted Files for Security Risks and Vulnerabilities
 @mcp.tool()
-async def guardian_scan(target_path: str = None, scan_uncommitted: bool = False) -> str:
+@instrument
+async def guardian_scan(target_path: str = None, scan_uncommitted: bool = False, workers: int = 1, diff_only: bool = False, ctx: Context = None) -> str:
     """
     Versatile security scanner.
     - If scan_uncommitted is True: Scans only changed files in Git.
+      With diff_only=True, tracked files are not rescanned: only the lines added
+      since HEAD are checked (fast pre-push mode); untracked files are scanned in full.
     - If target_path is provided: Scans that specific file or folder.
     - Default: Scans current working directory.
+    - workers: Processes to scan with (1 = serial, 0 = all CPU cores).
     """
     import os
-    import re
-    import subprocess
 
     project_root = os.path.abspath(os.getcwd())
     files_to_scan = []
+    hunks = None
+    GUARDIAN_EXTS = ('.ts', '.tsx', '.js', '.py', '.java', '.cs', '.cpp', '.env')
 
     # 1. STRATEGY: Find the files to scan
     if scan_uncommitted:
         try:
-            # Get list of modified and untracked files from Git
-            cmd = "git ls-files --others --modified --exclude-standard"
-            output = subprocess.check_output(cmd, shell=True, cwd=project_root).decode()
+            if diff_only:
+                # Stream the diff against HEAD (or the empty tree in a fresh repo) and scan added lines only
+                base = "HEAD"
+                try:
+                    await run_git(["rev-parse", "--verify", "-q", "HEAD"], project_root)
+                except RuntimeError:
+                    base = EMPTY_TREE
+                hunks = HunkScanner(GUARDIAN_ENGINE, GUARDIAN_EXTS)
+                diff_cmd = ["-c", "core.quotePath=false", "diff", base, "-U0", "--no-color", "--no-ext-diff",
+                            "--src-prefix=a/", "--dst-prefix=b/", "--relative"]
+                # Lines are matched in a worker thread, a batch at a time, so the event loop stays free
+                batch = []
+                async for raw in stream_git(diff_cmd, project_root):
+                    batch.append(raw)
+                    if len(batch) >= DIFF_BATCH_LINES:
+                        await run_blocking(hunks.feed_all, batch, ctx=ctx)
+                        batch = []
+                if batch:
+                    await run_blocking(hunks.feed_all, batch, ctx=ctx)
+
+                # Untracked files have no diff: they are scanned in full
+                output = await run_git(["ls-files", "--others", "--exclude-standard"], project_root)
+            else:
+                # Get list of modified and untracked files from Git
+                output = await run_git(["ls-files", "--others", "--modified", "--exclude-standard"], project_root)
             files_to_scan = [os.path.join(project_root, f) for f in output.splitlines()]
         except Exception:
             return "Error: This project doesn't seem to be a Git repository."
@@ -334,96 +668,134 @@ async def guardian_scan(target_path: str = None, scan_uncommitted: bool = False)
         # User specified a file or folder
         full_path = os.path.abspath(target_path)
         if os.path.isdir(full_path):
-            for root, dirs, files in os.walk(full_path):
-                dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', 'venv']]
-                for f in files:
-                    files_to_scan.append(os.path.join(root, f))
+            # An explicitly named folder is walked as is: build/dist or gitignored
+            # folders must not come back "clean" because the shared index prunes them
+            files_to_scan = await run_blocking(_walk_target, full_path, ctx=ctx)
         else:
             files_to_scan.append(full_path)
             
     else:
-        # Default: Fast walk of the current root
-        for root, dirs, files in os.walk(project_root):
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', 'venv']]
-            for f in files:
-                files_to_scan.append(os.path.join(root, f))
-
-    # 2. THE SCAN (Optimized)
-    RULES = {
-        "Hardcoded Secret": r"(?i)(api[_-]?key|secret|token|passwd)[\s]*[:=][\s]*['\"][a-zA-Z0-9_\-\.]{10,}['\"]",
-        "Private Key": r"-----BEGIN [A-Z ]+ PRIVATE KEY-----",
-        "Connection String": r"(mongodb|postgres|mysql):\/\/[^\s'\"@]+:[^\s'\"@]+@[^\s'\"]+",
-    }
+        # Default: the shared index of the current root
+        index = get_index(project_root)
+        files_to_scan = [index.abspath(f) for f in await run_blocking(lambda job: index.files(), ctx=ctx)]
 
+    # 2. THE SCAN (one compiled pass per file, binaries are skipped)
+    files_to_scan = [f for f in files_to_scan if f.endswith(GUARDIAN_EXTS)]
     findings = []
-    for f_path in files_to_scan:
-        if not f_path.endswith(('.ts', '.tsx', '.js', '.py', '.java', '.cs', '.cpp', '.env')):
-            continue
-        try:
-            with open(f_path, "r", encoding="utf-8", errors="ignore") as f:
-                for line_num, line in enumerate(f, 1):
-                    for name, pattern in RULES.items():
-                        if re.search(pattern, line):
-                            rel = os.path.relpath(f_path, project_root)
-                            findings.append(f" **{name}** in `{rel}` (Line {line_num})")
-        except: continue
+
+    def scan(job):
+        # Building the cache loads its file from disk: keep it off the event loop
+        cache = get_findings_cache(project_root, GUARDIAN_ENGINE)
+        return cache.scan(files_to_scan, workers, job)
+
+    results, hits, misses = await run_blocking(scan, ctx=ctx)
+    cache_note = f"*Cache: {hits} hits / {misses} misses*"
+    if hunks is not None:
+        cache_note += f"\n*Diff mode: {hunks.added_lines} added lines in {len(hunks.files)} tracked files*"
+        for rel, line_num, name in hunks.findings:
+            findings.append(f" **{name}** in `{rel}` (Line {line_num})")
+        if hunks.unparsed_hunks:
+            findings.append(f" ⚠️ **{hunks.unparsed_hunks} unparsed hunks**: their file could not be identified and they were NOT scanned. Re-run without diff_only.")
+    for f_path, file_findings in zip(files_to_scan, results):
+        for line_num, name in file_findings:
+            rel = os.path.relpath(f_path, project_root)
+            findings.append(f" **{name}** in `{rel}` (Line {line_num})")
 
     if not findings:
-        return "No secrets found in the requested files. Ready to go!"
+        return f"No secrets found in the requested files. Ready to go!\n{cache_note}"
 
-    return "## Guardian Scan Results\n" + "\n".join(findings)
+    return "## Guardian Scan Results\n" + cache_note + "\n" + "\n".join(findings)
 
 
 @mcp.tool()
-async def inspect_contract_change() -> str:
+@instrument
+async def inspect_contract_change(ctx: Context = None) -> str:
     """
     Analyzes uncommitted changes to identify modified 'Contracts' 
     (function signatures, class names, etc.) that require Sync.
+    Only the changed files are parsed: their HEAD and working-tree declaration
+    tables are compared, and HEAD-side tables are cached by blob hash.
     """
-    import subprocess
     import os
-    import re
 
     project_root = os.path.abspath(os.getcwd())
     
     try:
-        diff_cmd = "git diff -U0"
-        diff_output = subprocess.check_output(diff_cmd, shell=True, cwd=project_root).decode()
+        base = "HEAD"
+        try:
+            await run_git(["rev-parse", "--verify", "-q", "HEAD"], project_root)
+        except RuntimeError:
+            base = EMPTY_TREE
+        # --relative: paths relative to (and limited to) the cwd, which may be a repo subfolder
+        raw = await run_git(["-c", "core.quotePath=false", "diff", base, "--raw", "--no-abbrev", "--no-renames", "-z", "--relative"], project_root)
     except:
         return " Error: Could not retrieve git diff. Ensure this is a git repo."
 
-    if not diff_output:
+    if not raw:
         return "No uncommitted changes detected. Codebase is in harmony."
 
-    # This looks for lines starting with + (new) and - (old) that look like declarations
-    CONTRACT_PATTERN = r"(export\s+)?(function|class|const|interface)\s+([a-zA-Z0-9_]+)"
-    
-    changes = []
-    current_file = ""
-    
-    for line in diff_output.splitlines():
-        if line.startswith("--- a/"):
-            current_file = line[6:]
-        
-        # Look for the signature changes
-        match = re.search(CONTRACT_PATTERN, line)
-        if match:
-            type_of_change = "MODIFIED" if line.startswith("-") else "ADDED"
-            symbol_name = match.group(3)
-            changes.append(f"File: `{current_file}` | **{symbol_name}** ({type_of_change})")
-
-    if not changes:
+    # ':<old mode> <new mode> <old blob> <new blob> <status>\0<path>\0' per changed file
+    fields = raw.split("\0")
+    changed = []
+    for meta, rel in zip(fields[0::2], fields[1::2]):
+        parts = meta.split()
+        if len(parts) >= 5 and rel.endswith(CONTRACT_EXTS):
+            changed.append((rel, parts[2], parts[4]))
+
+    # HEAD-side tables: cached ones are kept here (the LRU may evict them before
+    # compare runs), the source is fetched only for blobs not cached yet
+    old_tables, old_sources = {}, {}
+    for rel, old_blob, status in changed:
+        if status.startswith("A"):
+            continue
+        table = TABLES.get(old_blob, rel)
+        if table is not None:
+            old_tables[rel] = table
+        elif old_blob not in old_sources:
+            old_sources[old_blob] = await run_git(["cat-file", "blob", old_blob], project_root)
+
+    def compare(job):
+        rows = []
+        for done, (rel, old_blob, status) in enumerate(changed):
+            job.progress(done, len(changed), rel)
+            if status.startswith("A"):
+                old = {}
+            elif rel in old_tables:
+                old = old_tables[rel]
+            else:
+                old = TABLES.table(old_blob, rel, old_sources[old_blob])
+            new = {}
+            if not status.startswith("D"):
+                try:
+                    with open(os.path.join(project_root, rel), 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    data = None
+                if data is not None:
+                    new = TABLES.table(blob_hash(data), rel, data.decode('utf-8', errors='replace'))
+            rows += [(rel,) + change for change in classify(old, new)]
+        return rows
+
+    rows = await run_blocking(compare, ctx=ctx)
+
+    if not rows:
         return "Changes detected, but no public 'Contracts' (functions/classes) were modified."
 
+    changes = []
+    for rel, change_type, name, detail in rows:
+        detail = f" {detail}" if detail else ""
+        changes.append(f"File: `{rel}` | **{name}** ({change_type}{detail})")
+
     report = "## Contract Change Manifest\n"
     report += "The following public signatures have changed and may require **Ripple Synchronization**:\n\n"
-    report += "\n".join(set(changes)) # Set to remove duplicates
+    report += "\n".join(changes)
     report += "\n\n**Next Step:** Would you like me to find all call-sites that need to be 'Healed' to match these changes?"
     
     return report
 
 @mcp.tool()
-async def heal_dependency_calls(symbol_name: str, file_path: str, change_type: str) -> str:
+@instrument
+async def heal_dependency_calls(symbol_name: str, file_path: str, change_type: str, ctx: Context = None) -> str:
     """
     Finds and proposes updates for all files calling a modified symbol.
     
@@ -438,20 +810,22 @@ async def heal_dependency_calls(symbol_name: str, file_path: str, change_type: s
     project_root = os.path.abspath(os.getcwd())
     affected_files = []
     
-    # 1. Locate all files that reference this symbol (simple grep-like scan)
-    # Excluding the source file and node_modules/dist/etc.
-    for root, dirs, files in os.walk(project_root):
-        dirs[:] = [d for d in dirs if d not in ['.git', 'node_modules', 'dist', 'build']]
-        for file in files:
-            if file.endswith(('.ts', '.js', '.py', '.java', '.cs')):
-                full_path = os.path.join(root, file)
-                if full_path == os.path.abspath(file_path):
-                    continue
-                
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if symbol_name in content:
-                        affected_files.append(full_path)
+    # 1. Locate all files that reference this symbol (inverted index lookup)
+    # Excluding the source file; node_modules/dist/etc. are pruned by the index.
+    # Re-synced first, like apply_sync: a stale index would report "no healing required".
+    source_path = os.path.abspath(file_path)
+
+    def find(job):
+        tokens = get_token_index(project_root)
+        tokens.project.refresh(force=True)
+        tokens.sync(force=True, job=job)
+        return tokens.find(symbol_name, job=job)
+
+    locations = await run_blocking(find, ctx=ctx)
+    for rel in dict.fromkeys(rel for rel, _ in locations):
+        full_path = os.path.join(project_root, rel)
+        if full_path != source_path and rel.endswith(('.ts', '.js', '.py', '.java', '.cs')):
+            affected_files.append(full_path)
 
     if not affected_files:
         return f"No external dependencies found for `{symbol_name}`. No healing required."
@@ -494,7 +868,8 @@ def generate_sync_patch(original_line: str, symbol: str, change_type: str, metad
 
 # Sync Patch Application
 @mcp.tool()
-async def apply_sync(symbol_name: str, change_type: str, metadata: dict) -> str:
+@instrument
+async def apply_sync(symbol_name: str, change_type: str, metadata: dict, ctx: Context = None) -> str:
     """
     Generates and applies code patches to heal broken call-sites across the project.
     
@@ -504,44 +879,103 @@ async def apply_sync(symbol_name: str, change_type: str, metadata: dict) -> str:
         metadata: Dictionary containing 'new_name' or 'new_params'.
     """
     import os
-    import re
 
     project_root = os.path.abspath(os.getcwd())
-    results = []
-
-    # 1. Reuse the logic from Feature 2 to find affected files
-    affected_files = find_affected_files(symbol_name) # Internal helper
-
-    for file_path in affected_files:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+    if change_type == "RENAME" and not metadata.get("new_name"):
+        return "❌ Error: RENAME needs metadata={'new_name': ...}."
+
+    def heal(job):
+        # 1. Candidate lines straight from the identifier index (no full scan),
+        #    re-synced first: stale postings would patch lines that have moved
+        tokens = get_token_index(project_root)
+        tokens.project.refresh(force=True)
+        tokens.sync(force=True, job=job)
+        by_file = {}
+        for rel, line_num in tokens.find(symbol_name, job=job):
+            by_file.setdefault(rel, []).append(line_num)
+
+        # 2. Patch only the indexed lines, staging the new contents
+        txn = Transaction(project_root)
+        patched, skipped = {}, []
+        for done, (rel, line_numbers) in enumerate(by_file.items()):
+            poll(job, done, len(by_file), "Preparing patches")
+            path = tokens.project.abspath(rel)
+            try:
+                st = os.stat(path)
+                text, changed = patch_lines(path, line_numbers, lambda line: generate_sync_patch(line, symbol_name, change_type, metadata))
+            except UnicodeDecodeError:
+                skipped.append(rel)
+                continue
+            except OSError:
+                continue
+            if changed:
+                txn.stage(rel, text, (st.st_size, st.st_mtime_ns))
+                patched[rel] = len(changed)
 
-        new_content = []
-        file_changed = False
+        # 3. Journal, then write every file concurrently (all or nothing)
+        written = txn.commit(job=job)
+        return [(rel, patched[rel]) for rel in written], skipped
 
-        for line in lines:
-            if symbol_name in line:
-                # Apply the Transformation Rules
-                healed_line = generate_sync_patch(line, symbol_name, change_type, metadata)
-                if healed_line != line:
-                    new_content.append(healed_line)
-                    file_changed = True
-                    continue
-            new_content.append(line)
+    # Roll back any batch a previous crash left half-written (files edited since are kept)
+    recovery_note = ""
+    try:
+        restored, kept = await run_blocking(lambda job: recover(project_root), ctx=ctx)
+    except (OSError, ValueError) as e:
+        restored, kept = [], []
+        recovery_note = f"⚠️ Crash recovery failed: {e}\n\n"
+    if restored or kept:
+        recovery_note = f"♻️ Recovered an interrupted sync: restored {len(restored)} files" + \
+                        "".join(f"\n- restored `{f}`" for f in restored) + \
+                        "".join(f"\n- ⚠️ kept `{f}` (edited since the interrupted sync)" for f in kept) + "\n\n"
 
-        if file_changed:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.writelines(new_content)
-            results.append(os.path.relpath(file_path, project_root))
+    try:
+        results, skipped = await run_blocking(heal, ctx=ctx)
+    except CommitFailed as e:
+        report = recovery_note + f"❌ Sync aborted: {e}\nRolled back {len(e.restored)} already-written files."
+        if e.unrestored:
+            report += "\n⚠️ NOT restored (edited meanwhile, or the restore failed): " + ", ".join(f"`{f}`" for f in e.unrestored)
+        return report
+    except (OSError, RuntimeError) as e:
+        return recovery_note + f"❌ Sync aborted before writing, no files were changed: {e}"
 
     if not results:
-        return "⚠️ No lines were modified. Check if the symbol name matches exactly."
+        return recovery_note + "⚠️ No lines were modified. Check if the symbol name matches exactly."
 
-    return f"## ✅ Ripple Sync Complete\nSuccessfully healed **{len(results)}** files:\n" + \
-           "\n".join([f"- `{f}`" for f in results]) + \
+    if skipped:
+        skipped_note = "\n\n⚠️ Skipped (not UTF-8): " + ", ".join(f"`{f}`" for f in skipped)
+    else:
+        skipped_note = ""
+
+    return recovery_note + f"## ✅ Ripple Sync Complete\nSuccessfully healed **{len(results)}** files:\n" + \
+           "\n".join([f"- `{f}` ({n} lines)" for f, n in results]) + skipped_note + \
            "\n\n**Next Step:** Run Feature 4 (Harmony Validator) to ensure code quality."
 
 
+# Server Instrumentation
+@mcp.tool()
+def server_stats(profile_next: str = None, reset: bool = False) -> str:
+    """
+    Reports per-tool call counts, latency histograms and work done (files/bytes
+    scanned, cache hit rates, git time) since the server started.
+    - profile_next: Profile the next call of this tool ('*' = any tool); its hot spots show up here afterwards.
+    - reset: Clear the counters after reporting.
+    """
+    report = render_stats()
+
+    if STATS.last_profile is not None:
+        tool, elapsed, text = STATS.last_profile
+        report += f"\n\n### Last profile: `{tool}` ({elapsed * 1000:.0f}ms)\n```\n{text.strip()}\n```"
+    if profile_next:
+        STATS.arm_profile(profile_next)
+        report += f"\n\n🔬 Profiling armed for the next `{profile_next}` call. Call `server_stats` again afterwards to see its hot spots."
+    elif STATS.profile_armed:
+        report += f"\n\n🔬 Profiling still armed for the next `{STATS.profile_armed}` call."
+    if reset:
+        STATS.reset()
+        report += "\n\n*Counters reset.*"
+    return report
+
+
 def main():
     mcp.run(transport='stdio')
 
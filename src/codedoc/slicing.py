@@ -0,0 +1,261 @@
+"""
+Structure-aware slicing of source files.
+
+Instead of pasting a whole file into a refactor prompt, the tools can send the
+file's outline plus only the units (classes, functions, methods) that match a
+symbol or a line range, within a token budget. Python is split with ``ast``;
+the other supported languages use a brace-based splitter. Outlines are cached
+per file version (content hash).
+"""
+import ast
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+# A structural unit: 1-based inclusive line span, nesting depth (0 = top level).
+Unit = namedtuple("Unit", "name kind start end depth")
+
+# Rough characters-per-token ratio used to turn a token budget into characters.
+CHARS_PER_TOKEN = 4
+
+# Outlines kept in memory (keyed by content hash).
+MAX_OUTLINES = 256
+
+# Deepest brace nesting whose declarations are listed (namespace > class > method).
+MAX_BRACE_DEPTH = 3
+
+_KEYWORDS = {
+    'if', 'for', 'foreach', 'while', 'switch', 'catch', 'return', 'new', 'else', 'do', 'try',
+    'finally', 'using', 'lock', 'synchronized', 'with', 'typeof', 'sizeof', 'function',
+}
+
+_TYPE_DECL = re.compile(r"\b(class|interface|struct|enum|namespace|record|trait)\s+([A-Za-z_$][\w$.]*)")
+_FUNCTION_DECL = re.compile(r"\bfunction\s*\*?\s*([A-Za-z_$][\w$]*)")
+_ARROW_DECL = re.compile(r"\b(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s*)?(?:function\b|\([^)]*\)[^=]*=>|[A-Za-z_$][\w$]*\s*=>)")
+_METHOD_DECL = re.compile(r"([A-Za-z_$~][\w$]*)\s*(?:<[^>]*>)?\s*\([^;]*\)\s*(?:const\b|override\b|noexcept\b|throws\s+[\w\s,.]+|:\s*[^{;]+|->\s*[^{;]+)*\s*\{?\s*$")
+
+
+def python_units(text: str) -> list:
+    """Classes, functions and methods of a Python module via ``ast``."""
+    units = []
+
+    def visit(body, prefix, depth):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                kind = "class" if isinstance(node, ast.ClassDef) else "def"
+                units.append(Unit(prefix + node.name, kind, start, node.end_lineno, depth))
+                visit(node.body, f"{prefix}{node.name}.", depth + 1)
+
+    visit(ast.parse(text).body, "", 0)
+    return units
+
+
+def indent_units(text: str) -> list:
+    """Indentation-based fallback for Python files that do not parse."""
+    lines = text.split('\n')
+    heads = []
+    for i, line in enumerate(lines, 1):
+        match = re.match(r"^(\s*)(?:async\s+)?(def|class)\s+([A-Za-z_]\w*)", line)
+        if match:
+            heads.append((i, len(match.group(1)), match.group(2), match.group(3)))
+
+    units = []
+    for i, indent, kind, name in heads:
+        end = i
+        for j in range(i, len(lines)):
+            stripped = lines[j].strip()
+            if stripped and len(lines[j]) - len(lines[j].lstrip()) <= indent:
+                break
+            if stripped:
+                end = j + 1
+        units.append(Unit(name, kind, i, end, indent // 4))
+    return units
+
+
+def _declaration(header: str):
+    """(kind, name) declared by a block header line, or None for control flow."""
+    match = _TYPE_DECL.search(header)
+    if match:
+        return match.group(1), match.group(2)
+    match = _FUNCTION_DECL.search(header) or _ARROW_DECL.search(header)
+    if match:
+        return "function", match.group(1)
+    match = _METHOD_DECL.search(header)
+    if match and match.group(1) not in _KEYWORDS:
+        return "method", match.group(1)
+    return None
+
+
+def brace_units(text: str) -> list:
+    """Declarations of brace languages (JS/TS/Java/C#/C++), found by matching braces."""
+    lines = text.split('\n')
+    units, stack = [], []
+    depth, line_num, i, n = 0, 1, 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '\n':
+            line_num += 1
+        elif ch in '"\'`':
+            # Skip string literals (escapes included)
+            j = i + 1
+            while j < n and text[j] != ch and (ch == '`' or text[j] != '\n'):
+                j += 2 if text[j] == '\\' else 1
+            line_num += text.count('\n', i, j)
+            # An unclosed quote (JSX text, regex literal) stops at the newline: leave it to be counted
+            i = j - 1 if j < n and text[j] == '\n' else j
+        elif text.startswith('//', i):
+            j = text.find('\n', i)
+            i = n if j == -1 else j
+            continue
+        elif text.startswith('/*', i):
+            j = text.find('*/', i + 2)
+            j = n if j == -1 else j + 2
+            line_num += text.count('\n', i, j)
+            i = j
+            continue
+        elif ch == '{':
+            header_line = line_num
+            header = text[text.rfind('\n', 0, i) + 1:i]
+            if not header.strip() and line_num > 1:
+                # Allman style: the declaration sits on the previous line
+                header_line = line_num - 1
+                header = lines[line_num - 2]
+            decl = _declaration(header) if depth < MAX_BRACE_DEPTH else None
+            stack.append((decl, header_line, depth))
+            depth += 1
+        elif ch == '}' and stack:
+            decl, start, unit_depth = stack.pop()
+            depth -= 1
+            if decl:
+                parents = [s[0][1] for s in stack if s[0] and s[0][0] != "namespace"]
+                name = ".".join(parents + [decl[1]])
+                units.append(Unit(name, decl[0], start, line_num, unit_depth))
+        i += 1
+    return sorted(units, key=lambda u: (u.start, u.depth))
+
+
+def split_units(path: str, text: str) -> list:
+    """Structural units of ``text`` for the language implied by ``path``."""
+    if path.endswith('.py'):
+        try:
+            return python_units(text)
+        except (SyntaxError, ValueError):
+            return indent_units(text)
+    return brace_units(text)
+
+
+class OutlineCache:
+    """LRU of units per file version (content hash)."""
+
+    def __init__(self, max_entries: int = MAX_OUTLINES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def units(self, path: str, text: str) -> list:
+        key = (path.rsplit('.', 1)[-1], hashlib.sha1(text.encode('utf-8', 'replace')).hexdigest())
+        with self._lock:
+            units = self._entries.get(key)
+            if units is not None:
+                self._entries.move_to_end(key)
+                return units
+        units = split_units(path, text)
+        with self._lock:
+            self._entries[key] = units
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return units
+
+
+OUTLINES = OutlineCache()
+
+
+def render_outline(units: list) -> str:
+    if not units:
+        return "(no classes or functions detected)"
+    return "\n".join(f"{'  ' * u.depth}- {u.kind} {u.name} (L{u.start}-{u.end})" for u in units)
+
+
+def parse_line_range(line_range: str) -> tuple:
+    """'120-180' -> (120, 180); a single number selects one line."""
+    start, _, end = line_range.replace(' ', '').partition('-')
+    if not start.isdigit() or (end and not end.isdigit()):
+        raise ValueError(f"Invalid line_range '{line_range}'. Use 'start-end', e.g. '120-180'.")
+    start, end = int(start), int(end or start)
+    if start < 1 or end < start:
+        raise ValueError(f"Invalid line_range '{line_range}'.")
+    return start, end
+
+
+def _outermost(units: list) -> list:
+    """Drops units nested inside another selected unit."""
+    kept = []
+    for unit in sorted(units, key=lambda u: (u.start, -u.end)):
+        if not kept or unit.start > kept[-1].end:
+            kept.append(unit)
+    return kept
+
+
+def _with_module_code(units: list, lines: list) -> list:
+    """Top-level units plus the module code between them (imports, constants, main block) as their own units."""
+    top = _outermost(units)
+    result, line = [], 1
+    for unit in top + [Unit("", "", len(lines) + 1, len(lines), 0)]:
+        start, end = line, unit.start - 1
+        while start <= end and not lines[start - 1].strip():
+            start += 1
+        while end >= start and not lines[end - 1].strip():
+            end -= 1
+        if start <= end:
+            result.append(Unit("module code", "top-level", start, end, 0))
+        if unit.name:
+            result.append(unit)
+        line = unit.end + 1
+    return result
+
+
+def build_slice(path: str, text: str, symbol: str = None, line_range: str = None, max_tokens: int = 0, job=None) -> str:
+    """
+    Returns the outline of ``text`` followed by only the relevant units.
+    - symbol: Units named ``symbol`` (or ``Parent.symbol``).
+    - line_range: Units overlapping 'start-end' (the raw range if none does).
+    - max_tokens: Budget for the code part; units are added in file order until it is spent.
+      With neither symbol nor line_range, a file that fits is returned whole; otherwise
+      the module code between units is budgeted like any other unit.
+    Raises ValueError when nothing matches.
+    """
+    lines = text.split('\n')
+    units = OUTLINES.units(path, text)
+
+    if symbol:
+        selected = [u for u in units if u.name == symbol or u.name.endswith('.' + symbol)]
+        if not selected:
+            raise ValueError(f"Symbol '{symbol}' not found. Outline:\n{render_outline(units)}")
+    elif line_range:
+        start, end = parse_line_range(line_range)
+        selected = [u for u in units if u.start <= end and u.end >= start]
+        deepest = [u for u in selected if not any(o is not u and o.start >= u.start and o.end <= u.end for o in selected)]
+        selected = deepest or [Unit(f"lines {start}-{end}", "range", start, min(end, len(lines)), 0)]
+    else:
+        if not max_tokens or len(text) <= max_tokens * CHARS_PER_TOKEN:
+            return text
+        selected = _with_module_code(units, lines) or [Unit("file", "range", 1, len(lines), 0)]
+
+    budget = max_tokens * CHARS_PER_TOKEN if max_tokens else None
+    parts, used, omitted = [], 0, []
+    for unit in _outermost(selected):
+        code = "\n".join(lines[unit.start - 1:unit.end])
+        if budget is not None and used + len(code) > budget:
+            if parts:
+                omitted.append(unit)
+                continue
+            code = code[:budget] + "\n... (truncated to fit max_tokens)"
+        used += len(code)
+        parts.append(f"# L{unit.start}-{unit.end}: {unit.kind} {unit.name}\n{code}")
+
+    result = f"OUTLINE:\n{render_outline(units)}\n\nSELECTED CODE:\n" + "\n\n".join(parts)
+    if omitted:
+        result += "\n\n(Omitted to fit max_tokens: " + ", ".join(f"{u.name} (L{u.start}-{u.end})" for u in omitted) + ")"
+    return result
@@ -0,0 +1,216 @@
+"""
+Lightweight per-tool instrumentation.
+
+``@instrument`` sits between ``@mcp.tool()`` and the tool function. Each call
+gets a fresh counter dict in a context variable, so helpers deep inside a
+scan (and the worker threads started through ``run_blocking``) can ``count()``
+files, bytes, cache hits or git time without threading a parameter through.
+When the call ends, its counters are folded into the tool's totals. The
+``server_stats`` tool reads those totals back.
+
+A single call can also be profiled on request: the worker threads it starts
+run under cProfile, and the top hot spots are kept for ``server_stats``.
+"""
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import pstats
+import threading
+import time
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Functions listed in a profile report.
+PROFILE_TOP = 15
+
+_CALL = contextvars.ContextVar("codedoc_call", default=None)
+
+
+class ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.counters = {}
+
+    def add(self, elapsed: float, failed: bool, counters: dict):
+        self.calls += 1
+        self.errors += failed
+        self.total_s += elapsed
+        self.max_s = max(self.max_s, elapsed)
+        ms = elapsed * 1000
+        self.buckets[next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound), -1)] += 1
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def percentile(self, q: float) -> str:
+        """Upper bound of the bucket holding the q-th percentile call."""
+        rank, seen = q * self.calls, 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return f"≤{LATENCY_BUCKETS_MS[i]}ms" if i < len(LATENCY_BUCKETS_MS) else f">{LATENCY_BUCKETS_MS[-1]}ms"
+        return "-"
+
+
+class Stats:
+    """Per-tool totals plus the armed/last profile."""
+
+    def __init__(self):
+        self._tools = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._profile_armed = None  # tool name or "*" for the next call of any tool
+        self.last_profile = None
+
+    def record(self, tool: str, elapsed: float, failed: bool, counters: dict):
+        with self._lock:
+            self._tools.setdefault(tool, ToolStats()).add(elapsed, failed, counters)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._tools)
+
+    def reset(self):
+        with self._lock:
+            self._tools = {}
+            self.started = time.time()
+
+    def arm_profile(self, tool: str = "*"):
+        with self._lock:
+            self._profile_armed = tool
+
+    def take_profile(self, tool: str) -> bool:
+        """True once for the call that should be profiled."""
+        with self._lock:
+            if self._profile_armed in ("*", tool):
+                self._profile_armed = None
+                return True
+            return False
+
+    @property
+    def profile_armed(self):
+        return self._profile_armed
+
+
+STATS = Stats()
+
+
+class _Call:
+    """Counters and (optional) profiler of one tool call."""
+
+    def __init__(self, tool: str, profile: bool):
+        self.tool = tool
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.profiler = cProfile.Profile() if profile else None
+
+
+def count(key: str, amount: float = 1):
+    """Adds ``amount`` to a counter of the tool call in progress (no-op outside one)."""
+    call = _CALL.get()
+    if call is not None:
+        with call.lock:
+            call.counters[key] = call.counters.get(key, 0) + amount
+
+
+def profiled(fn):
+    """Runs ``fn`` under the current call's profiler, if that call is being profiled."""
+    call = _CALL.get()
+    if call is None or call.profiler is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            call.profiler.enable()
+        except ValueError:
+            return fn(*args, **kwargs)  # another profiler is active in this process
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            call.profiler.disable()
+    return wrapper
+
+
+def _finish(call: _Call, start: float, failed: bool):
+    STATS.record(call.tool, time.perf_counter() - start, failed, call.counters)
+    if call.profiler is not None:
+        out = io.StringIO()
+        pstats.Stats(call.profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        STATS.last_profile = (call.tool, time.perf_counter() - start, out.getvalue())
+
+
+def instrument(fn):
+    """Records latency and counters of every call of a tool; keeps sync tools sync."""
+    tool = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            call = _Call(tool, STATS.take_profile(tool))
+            token = _CALL.set(call)
+            start, failed = time.perf_counter(), True
+            try:
+                result = await fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _CALL.reset(token)
+                _finish(call, start, failed)
+        return wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        call = _Call(tool, STATS.take_profile(tool))
+        token = _CALL.set(call)
+        start, failed = time.perf_counter(), True
+        try:
+            result = profiled(fn)(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _CALL.reset(token)
+            _finish(call, start, failed)
+    return wrapper
+
+
+def render_stats() -> str:
+    """Markdown report of the totals since start (or the last reset)."""
+    tools = STATS.snapshot()
+    uptime = time.time() - STATS.started
+    if not tools:
+        return f"No tool calls recorded yet (window: {uptime:.0f}s)."
+
+    lines = [f"## CodeDoc Server Stats\n*Window: {uptime:.0f}s*\n",
+             "| Tool | Calls | Errors | Avg | p50 | p95 | Max |",
+             "| :--- | ---: | ---: | ---: | ---: | ---: | ---: |"]
+    for name, t in sorted(tools.items()):
+        lines.append(f"| `{name}` | {t.calls} | {t.errors} | {t.total_s / t.calls * 1000:.1f}ms | "
+                     f"{t.percentile(0.5)} | {t.percentile(0.95)} | {t.max_s * 1000:.1f}ms |")
+
+    coalesced = sum(t.counters.get("coalesced_calls", 0) for t in tools.values())
+    if coalesced:
+        lines.append(f"\n*Coalescing: {coalesced} waits on identical in-flight work.*")
+
+    lines.append("\n### Work done")
+    for name, t in sorted(tools.items()):
+        if not t.counters:
+            continue
+        c = t.counters
+        parts = [f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in sorted(c.items())]
+        looked_up = c.get("cache_hits", 0) + c.get("cache_misses", 0)
+        if looked_up:
+            parts.append(f"hit rate={c.get('cache_hits', 0) / looked_up:.0%}")
+        lines.append(f"- `{name}`: " + ", ".join(parts))
+
+    lines.append("\n### Latency histogram")
+    bounds = [f"≤{b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+    for name, t in sorted(tools.items()):
+        lines.append(f"- `{name}`: " + ", ".join(f"{b}: {n}" for b, n in zip(bounds, t.buckets) if n))
+    return "\n".join(lines)
@@ -0,0 +1,319 @@
+"""
+Identifier-level inverted index.
+
+Maps every identifier in the project's source files to its (file, line)
+postings so impact lookups no longer read the whole repository. Postings
+live in SQLite under ``<project>/.codedoc/`` (line numbers packed as
+uint32 arrays), so they survive restarts and only file paths, sizes and
+mtimes are kept in memory.
+
+A sync follows the project index: only folders re-listed since the last
+sync (files created, deleted or replaced) have their files stat-ed, so a
+lookup costs milliseconds even on very large trees. Edits written in place
+do not touch the folder, so every FULL_SYNC_INTERVAL seconds (and on
+``force``) all files are stat-ed once: a plain lookup may miss an in-place
+edit for up to FULL_SYNC_INTERVAL seconds. Callers that act on the answer
+(heal_dependency_calls, apply_sync) force a full sync first.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+from codedoc.cache import cache_dir
+from codedoc.index import get_index
+from codedoc.flight import FLIGHTS
+from codedoc.jobs import poll
+from codedoc.stats import count
+
+IDENTIFIER = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*")
+
+# Union of the extensions the impact/healing tools care about.
+SOURCE_EXTS = ('.ts', '.tsx', '.js', '.py', '.java', '.cs', '.cpp', '.h')
+
+# Seconds during which the postings are trusted without looking at the disk.
+SYNC_INTERVAL = 2.0
+
+# Seconds between full stat sweeps (the only way to see in-place edits).
+FULL_SYNC_INTERVAL = 30.0
+
+TOKENS_DB = "tokens.sqlite"
+
+# Bump when the tokenizer or the table layout changes: older databases are rebuilt.
+SCHEMA_VERSION = 1
+
+# Files (re)indexed per SQLite transaction.
+COMMIT_EVERY = 1000
+
+
+def is_identifier(text: str) -> bool:
+    return IDENTIFIER.fullmatch(text) is not None
+
+
+def tokenize(text: str) -> dict:
+    """Returns {token: (line, ...)} for one file's text (1-based lines)."""
+    postings = {}
+    for line_num, line in enumerate(text.split('\n'), 1):
+        for token in IDENTIFIER.findall(line):
+            lines = postings.get(token)
+            if lines is None:
+                postings[token] = [line_num]
+            elif lines[-1] != line_num:
+                lines.append(line_num)
+    return {token: tuple(lines) for token, lines in postings.items()}
+
+
+def anchor_tokens(query: str) -> set:
+    """
+    Identifiers every line matching the text ``query`` must contain as whole tokens.
+    One touching the start or end of the query may be cut out of a longer token
+    ('fetch(' also matches 'prefetch('), so it does not count.
+    """
+    tokens = set()
+    for match in IDENTIFIER.finditer(query):
+        if match.start() == 0 or match.end() == len(query):
+            continue
+        tokens.add(match.group())
+    return tokens
+
+
+def read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+        return f.read()
+
+
+def _pack(lines) -> bytes:
+    return array('I', lines).tobytes()
+
+
+def _unpack(blob: bytes) -> array:
+    lines = array('I')
+    lines.frombytes(blob)
+    return lines
+
+
+class TokenIndex:
+    """
+    Inverted index over the project index's source files.
+    - _files: rel_path -> (file_id, size, mtime_ns), mirroring the ``files`` table
+    - ``postings`` table: (token, file_id) -> packed lines
+    """
+
+    def __init__(self, root: str, suffixes: tuple = SOURCE_EXTS, sync_interval: float = SYNC_INTERVAL,
+                 full_sync_interval: float = FULL_SYNC_INTERVAL):
+        self.project = get_index(root)
+        self.root = self.project.root
+        self.suffixes = suffixes
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self._lock = threading.RLock()
+        self._last_sync = None
+        self._last_full = None
+        self._generation = None
+        self._db = self._open()
+        self._load()
+
+    def _open(self):
+        try:
+            db = sqlite3.connect(os.path.join(cache_dir(self.root), TOKENS_DB), timeout=30, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+        except (OSError, sqlite3.Error):
+            db = sqlite3.connect(":memory:", check_same_thread=False)  # read-only checkout
+        version = f"{SCHEMA_VERSION}:{','.join(self.suffixes)}"
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != version:
+            with db:
+                db.execute("DROP TABLE IF EXISTS postings")
+                db.execute("DROP TABLE IF EXISTS files")
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        with db:
+            db.execute("CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime_ns INTEGER)")
+            db.execute("CREATE TABLE IF NOT EXISTS postings (token TEXT, file_id INTEGER, lines BLOB, "
+                       "PRIMARY KEY (token, file_id)) WITHOUT ROWID")
+            db.execute("CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id)")
+        return db
+
+    def _load(self):
+        self._files = {path: (file_id, size, mtime) for file_id, path, size, mtime
+                       in self._db.execute("SELECT id, path, size, mtime_ns FROM files")}
+
+    def _forget(self, rel: str):
+        entry = self._files.pop(rel, None)
+        if entry is None:
+            return
+        self._db.execute("DELETE FROM postings WHERE file_id = ?", (entry[0],))
+        self._db.execute("DELETE FROM files WHERE id = ?", (entry[0],))
+
+    def _index_file(self, rel: str, size: int, mtime: int):
+        self._forget(rel)
+        try:
+            tokens = tokenize(read_text(self.project.abspath(rel)))
+        except OSError:
+            return
+        count("files_indexed")
+        count("bytes_read", size)
+        file_id = self._db.execute("INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?)", (rel, size, mtime)).lastrowid
+        self._db.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                             ((token, file_id, _pack(lines)) for token, lines in tokens.items()))
+        self._files[rel] = (file_id, size, mtime)
+
+    def sync(self, force: bool = False, job=None):
+        """Re-tokenizes new or changed files and drops deleted ones (one pass for concurrent callers)."""
+        if not force and self._last_sync is not None and time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        FLIGHTS.do(("tokens", self.root, self.suffixes, force), lambda: self._sync(force, job), job=job)
+
+    def _sync(self, force: bool, job=None):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_sync is not None and now - self._last_sync < self.sync_interval:
+                return
+
+            self.project.refresh(force=force)
+            generation = self.project.generation
+            full = force or self._last_full is None or now - self._last_full >= self.full_sync_interval
+            if full or generation != self._generation:
+                current = self.project.files(self.suffixes)
+                present = set(current)
+                removed = [rel for rel in self._files if rel not in present]
+                if full:
+                    candidates = current
+                else:
+                    # Only folders re-listed since the last sync can hold new or replaced files
+                    dirs = self.project.changed_dirs(self._generation)
+                    candidates = [rel for rel in current if rel not in self._files or os.path.dirname(rel) in dirs]
+            else:
+                removed, candidates = [], []
+
+            try:
+                for rel in removed:
+                    self._forget(rel)
+                pending = 0
+                for done, rel in enumerate(candidates):
+                    poll(job, done, len(candidates), "Indexing identifiers")
+                    try:
+                        st = os.stat(self.project.abspath(rel))
+                    except OSError:
+                        self._forget(rel)
+                        continue
+                    entry = self._files.get(rel)
+                    if entry is None or entry[1] != st.st_size or entry[2] != st.st_mtime_ns:
+                        self._index_file(rel, st.st_size, st.st_mtime_ns)
+                        pending += 1
+                        if pending >= COMMIT_EVERY:
+                            self._db.commit()
+                            pending = 0
+                self._db.commit()
+            except BaseException:
+                # Keep memory and database in step: drop the uncommitted part of this pass
+                self._db.rollback()
+                self._load()
+                raise
+
+            count("files_statted", len(candidates))
+            self._generation = generation
+            if full:
+                self._last_full = now
+            self._last_sync = time.monotonic()
+
+    def _holders(self, token: str) -> set:
+        return {path for (path,) in self._db.execute(
+            "SELECT f.path FROM postings p JOIN files f ON f.id = p.file_id WHERE p.token = ?", (token,))}
+
+    def _postings(self, token: str) -> list:
+        rows = self._db.execute(
+            "SELECT f.path, p.lines FROM postings p JOIN files f ON f.id = p.file_id WHERE p.token = ?", (token,))
+        return [(rel, line) for rel, blob in sorted(rows) for line in _unpack(blob)]
+
+    def lookup(self, token: str, job=None) -> list:
+        """Returns sorted (rel_path, line) postings for one whole identifier."""
+        self.sync(job=job)
+        with self._lock:
+            return self._postings(token)
+
+    def find(self, query: str, job=None) -> list:
+        """
+        Returns sorted (rel_path, line) locations of ``query``.
+        Identifiers match whole tokens only; anything else (e.g. ``api.fetch(``)
+        is narrowed to files holding all of its inner identifiers (see anchor_tokens), then matched as text.
+        """
+        if is_identifier(query):
+            return self.lookup(query, job)
+        # Text queries read files: identical concurrent queries share one read
+        return FLIGHTS.do(("find", self.root, query), lambda: self._find_text(query, job), job=job)
+
+    def _find_text(self, query: str, job=None) -> list:
+        self.sync(job=job)
+        tokens = anchor_tokens(query)
+        with self._lock:
+            if tokens:
+                candidates = set.intersection(*(self._holders(t) for t in tokens))
+            else:
+                candidates = set(self._files)
+
+        locations = []
+        for rel in sorted(candidates):
+            poll(job)
+            try:
+                text = read_text(self.project.abspath(rel))
+            except OSError:
+                continue
+            count("bytes_read", len(text))
+            for line_num, line in enumerate(text.split('\n'), 1):
+                if query in line:
+                    locations.append((rel, line_num))
+        return locations
+
+    def find_many(self, queries: list, job=None) -> dict:
+        """
+        Batch ``find``: returns {query: sorted (rel_path, line) locations} after a single sync.
+        Identifiers are posting lookups; all other queries share one read of their
+        candidate files, with one compiled alternation prefiltering each line.
+        """
+        self.sync(job=job)
+        results = {}
+        by_file = {}
+        with self._lock:
+            for query in dict.fromkeys(queries):
+                if is_identifier(query):
+                    results[query] = self._postings(query)
+                    continue
+                results[query] = []
+                tokens = anchor_tokens(query)
+                candidates = set.intersection(*(self._holders(t) for t in tokens)) if tokens else set(self._files)
+                for rel in candidates:
+                    by_file.setdefault(rel, []).append(query)
+
+        if by_file:
+            pattern = re.compile("|".join(re.escape(q) for q in sorted({q for qs in by_file.values() for q in qs}, key=len, reverse=True)))
+            for done, rel in enumerate(sorted(by_file)):
+                poll(job, done, len(by_file), "Matching symbols")
+                try:
+                    text = read_text(self.project.abspath(rel))
+                except OSError:
+                    continue
+                count("bytes_read", len(text))
+                wanted = by_file[rel]
+                for line_num, line in enumerate(text.split('\n'), 1):
+                    if pattern.search(line):
+                        for query in wanted:
+                            if query in line:
+                                results[query].append((rel, line_num))
+        return results
+
+
+_TOKEN_INDEXES = {}
+_TOKEN_INDEXES_LOCK = threading.Lock()
+
+
+def get_token_index(root: str) -> TokenIndex:
+    """Returns the shared token index for ``root``, creating it on first use."""
+    root = os.path.abspath(root)
+    with _TOKEN_INDEXES_LOCK:
+        index = _TOKEN_INDEXES.get(root)
+        if index is None:
+            index = _TOKEN_INDEXES[root] = TokenIndex(root)
+    return index
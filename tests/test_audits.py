@@ -0,0 +1,59 @@
+"""Delta audits: reports stay attached to the audited text and big changes fall back to a full audit."""
+from codedoc.audits import MAX_DELTA_RATIO, AuditCache, changed_regions, worth_delta
+
+BASE = "\n".join(f"line {n}" for n in range(1, 11))
+
+
+def _edit(text, count):
+    lines = text.split("\n")
+    return "\n".join(f"edited {n}" if n <= count else line for n, line in enumerate(lines, 1))
+
+
+def test_delta_falls_back_to_full_audit_above_the_ratio():
+    limit = int(MAX_DELTA_RATIO * 10)
+    regions, changed = changed_regions(BASE, _edit(BASE, limit))
+    assert changed == limit and worth_delta(changed, _edit(BASE, limit))
+    assert "+     1 | edited 1" in regions and "-       | line 1" in regions
+
+    _, changed = changed_regions(BASE, _edit(BASE, limit + 1))
+    assert not worth_delta(changed, _edit(BASE, limit + 1))
+
+
+def test_changed_regions_number_new_lines_and_keep_context():
+    new = BASE.replace("line 8", "line 8\ninserted")
+    regions, changed = changed_regions(BASE, new, context=1)
+    assert changed == 1
+    assert regions == "@@ new L8-10 (was L8-9) @@\n      8 | line 8\n+     9 | inserted\n     10 | line 9"
+
+
+def test_report_attaches_to_the_text_sent_before_it():
+    cache = AuditCache()
+    assert not cache.record_report("a.py", "report")  # never sent
+
+    cache.remember("a.py", BASE)
+    assert cache.get("a.py").report is None
+    assert cache.record_report("a.py", "score 7")
+    entry = cache.get("a.py")
+    assert (entry.base, entry.report) == (BASE, "score 7")
+
+    # A newer version sent for audit does not move the report's base until its own report arrives
+    cache.remember("a.py", _edit(BASE, 1))
+    entry = cache.get("a.py")
+    assert (entry.sent, entry.base, entry.report) == (_edit(BASE, 1), BASE, "score 7")
+    cache.record_report("a.py", "score 8")
+    assert (entry.base, entry.report) == (_edit(BASE, 1), "score 8")
+
+
+def test_entries_are_bounded_by_count_and_size():
+    cache = AuditCache(max_files=2, max_chars=100)
+    cache.remember("a.py", "a")
+    cache.remember("b.py", "b")
+    cache.get("a.py")
+    cache.remember("c.py", "c")
+    assert cache.get("b.py") is None and cache.get("a.py") is not None
+
+    cache.record_report("c.py", "r" * 99)  # sent + base + report > max_chars
+    assert cache.get("a.py") is None
+    assert cache.get("c.py") is None  # too big on its own
+    cache.remember("d.py", "d" * 50)
+    assert cache.get("d.py").sent == "d" * 50
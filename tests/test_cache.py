@@ -0,0 +1,104 @@
+"""The findings cache rescans only real edits and persists exactly what it keeps."""
+import os
+
+import pytest
+
+from codedoc import cache
+from codedoc.cache import FindingsCache
+from codedoc.scanner import AUDIT_ENGINE, GUARDIAN_ENGINE
+
+SECRET = 'password = "hunter2hunter2"\napi_key = "abcdefghijklmnop"\n'
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "a.py").write_text(SECRET)
+    (tmp_path / "b.py").write_text("x = 1\n")
+    (tmp_path / "c.bin").write_bytes(b"\x00\x01" + SECRET.encode())
+    return tmp_path
+
+
+def _paths(root, *names):
+    return [str(root / name) for name in names]
+
+
+def _no_reads(monkeypatch):
+    """Any file read by the cache from now on fails the test."""
+    def scan_files(engine, paths, *args, **kwargs):
+        assert not paths, f"rescanned {paths}"
+        return []
+    monkeypatch.setattr(cache, "scan_files", scan_files)
+    monkeypatch.setattr(cache, "file_digest", lambda path: pytest.fail(f"hashed {path}"))
+
+
+def test_hit_costs_one_stat(repo, monkeypatch):
+    paths = _paths(repo, "a.py", "b.py")
+    first = FindingsCache(str(repo), AUDIT_ENGINE).scan(paths)
+    assert first[1:] == (0, 2)
+
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda path, *a, **k: stats.append(path) or real_stat(path, *a, **k))
+    _no_reads(monkeypatch)
+    again = FindingsCache(str(repo), AUDIT_ENGINE).scan(paths)  # reloaded from disk
+    assert again == (first[0], 2, 0)
+    assert sorted(p for p in stats if p in paths) == sorted(paths)
+
+
+def test_touched_identical_file_is_served_from_its_hash(repo, monkeypatch):
+    paths = _paths(repo, "a.py")
+    findings = FindingsCache(str(repo), AUDIT_ENGINE).scan(paths)[0]
+    st = os.stat(paths[0])
+    os.utime(paths[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    monkeypatch.setattr(cache, "scan_files", lambda engine, p, *a, **k: [] if not p else pytest.fail(f"rescanned {p}"))
+    assert FindingsCache(str(repo), AUDIT_ENGINE).scan(paths) == (findings, 1, 0)
+
+    # The new mtime was written back: the next run does not even hash
+    _no_reads(monkeypatch)
+    assert FindingsCache(str(repo), AUDIT_ENGINE).scan(paths) == (findings, 1, 0)
+
+
+def test_touched_binary_is_sniffed_again(repo, monkeypatch):
+    paths = _paths(repo, "c.bin")
+    scanner = FindingsCache(str(repo), AUDIT_ENGINE)
+    assert scanner.scan(paths) == ([[]], 0, 1)
+    st = os.stat(paths[0])
+    os.utime(paths[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    monkeypatch.setattr(cache, "file_digest", lambda path: pytest.fail(f"hashed {path}"))
+    assert scanner.scan(paths) == ([[]], 0, 1)
+
+
+def test_entries_are_keyed_by_rule_set(repo):
+    paths = _paths(repo, "a.py")
+    audit = FindingsCache(str(repo), AUDIT_ENGINE)
+    guardian = FindingsCache(str(repo), GUARDIAN_ENGINE)
+    assert audit.path != guardian.path
+
+    audit_findings, _, _ = audit.scan(paths)
+    guardian_findings, hits, misses = guardian.scan(paths)
+    assert (hits, misses) == (0, 1)
+    assert audit_findings == [[(1, "Sensitive Variable"), (2, "Sensitive Variable")]]
+    assert guardian_findings == [[(2, "Hardcoded Secret")]]
+
+
+def test_eviction_is_written_through_save(repo):
+    scanner = FindingsCache(str(repo), AUDIT_ENGINE, max_entries=2)
+    scanner.scan(_paths(repo, "a.py", "b.py"))
+    scanner.scan(_paths(repo, "c.bin"))
+    assert list(scanner._entries) == _paths(repo, "b.py", "c.bin")
+    assert list(FindingsCache(str(repo), AUDIT_ENGINE)._entries) == _paths(repo, "b.py", "c.bin")
+
+
+def test_counters_match_the_reported_hits_and_misses(repo, monkeypatch):
+    counters = {}
+    monkeypatch.setattr(cache, "count", lambda key, amount=1: counters.__setitem__(key, counters.get(key, 0) + amount))
+    scanner = FindingsCache(str(repo), AUDIT_ENGINE)
+    scanner.scan(_paths(repo, "a.py"))
+    (repo / "b.py").write_text("x = 2\n")
+
+    counters.clear()
+    _, hits, misses = scanner.scan(_paths(repo, "a.py", "b.py", "missing.py"))
+    assert (hits, misses) == (1, 1)
+    assert counters["cache_hits"] == hits and counters["cache_misses"] == misses
+    assert counters["files_scanned"] == 1 and counters["bytes_scanned"] == len("x = 2\n")
@@ -0,0 +1,69 @@
+"""Declaration tables tell renames and parameter changes apart and stay cached by blob."""
+from codedoc.contracts import TableCache, blob_hash, classify, declaration_table
+
+OLD_PY = """class Api:
+    def fetch(self, url, timeout):
+        pass
+
+def g(a, b, c):
+    pass
+
+def load(path):
+    pass
+
+def gone():
+    pass
+"""
+
+NEW_PY = """class Api:
+    def fetch(self, url, timeout, retries):
+        pass
+
+def g(a, b, c):
+    pass
+
+def read(path):
+    pass
+
+def fresh(x):
+    pass
+"""
+
+
+def test_classify_python_changes():
+    old = declaration_table("m.py", OLD_PY)
+    new = declaration_table("m.py", NEW_PY)
+    assert classify(old, new) == [
+        ("PARAM_ADDED", "Api.fetch", "+retries"),
+        ("RENAME", "load", "-> read"),
+        ("REMOVED", "gone", ""),
+        ("ADDED", "fresh", ""),
+    ]
+
+
+def test_classify_brace_param_changes():
+    old = declaration_table("m.ts", "function send(to: string, body?: string) {\n  return 1;\n}\n")
+    new = declaration_table("m.ts", "function send(body: string, to: string) {\n  return 1;\n}\n")
+    removed = declaration_table("m.ts", "function send(to: string) {\n  return 1;\n}\n")
+    assert classify(old, new) == [("PARAMS_CHANGED", "send", "(to, body) -> (body, to)")]
+    assert classify(old, removed) == [("PARAM_REMOVED", "send", "-body")]
+    assert classify(declaration_table("m.py", "def (:\n"), {}) == []
+
+
+def test_cache_evicts_lru_and_reparses_from_the_given_source():
+    cache = TableCache(max_entries=2)
+    blob = blob_hash(OLD_PY.encode())
+    first = cache.table(blob, "m.py", OLD_PY)
+    assert cache.table(blob, "m.py", "") is first  # hits never look at the text
+
+    cache.table("b" * 40, "m.py", "def x(): pass\n")
+    cache.get(blob, "m.py")  # refresh: "b" is now the oldest
+    cache.table("c" * 40, "m.py", "def y(): pass\n")
+    assert cache.get("b" * 40, "m.py") is None
+    assert cache.get(blob, "m.py") == first
+    assert cache.get(blob, "m.ts") is None  # keyed by extension too
+
+    cache.table("d" * 40, "m.py", "")
+    cache.table("e" * 40, "m.py", "")
+    assert cache.get(blob, "m.py") is None
+    assert cache.table(blob, "m.py", OLD_PY)["g"].params == ("a", "b", "c")
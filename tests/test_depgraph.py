@@ -0,0 +1,47 @@
+"""Python imports resolve against source roots only and are read one statement at a time."""
+from codedoc.depgraph import DependencyGraph
+
+
+def test_stdlib_names_do_not_match_nested_modules(tmp_path):
+    files = {
+        "app/util/logging.py": "x = 1\n",
+        "svc/a.py": "import logging, json\n",
+        "svc/c.py": "import app.util.logging\n",
+        "src/pkg/__init__.py": "",
+        "src/pkg/sub/__init__.py": "",
+        "src/pkg/sub/mod.py": "x = 1\n",
+        "src/pkg/user.py": "from pkg.sub import mod\n",
+    }
+    for rel, text in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    graph = DependencyGraph(str(tmp_path))
+    assert graph.dependents("app/util/logging.py") == [("svc/c.py", 1)]
+    assert graph.dependents("src/pkg/sub/mod.py") == [("src/pkg/user.py", 1)]
+
+
+def test_consecutive_and_parenthesised_from_imports(tmp_path):
+    files = {
+        "pkg/__init__.py": "",
+        "pkg/alpha.py": "",
+        "pkg/beta.py": "X = 1\n",
+        "pkg/gamma.py": "",
+        "pkg/delta.py": "",
+        "main.py": ("from pkg import alpha\n"
+                    "from pkg.beta import X\n"
+                    "from pkg import (  # submodules\n"
+                    "    gamma,\n"
+                    "    delta as d,\n"
+                    ")\n"),
+    }
+    for rel, text in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    graph = DependencyGraph(str(tmp_path))
+    assert graph.dependencies("main.py") == [
+        "pkg/__init__.py", "pkg/alpha.py", "pkg/beta.py", "pkg/delta.py", "pkg/gamma.py"]
+    assert graph.dependents("pkg/beta.py") == [("main.py", 1)]
@@ -0,0 +1,66 @@
+"""The doc store skips unchanged sources and prunes old revisions without touching the current doc."""
+import os
+
+from codedoc.docstore import DOC_RETENTION, MANIFEST_NAME, DocStore, text_digest
+
+
+def _docs(store):
+    return sorted(f for f in os.listdir(store.folder) if f.endswith(".md"))
+
+
+def test_unchanged_hash_is_a_no_op(tmp_path):
+    store = DocStore(str(tmp_path))
+    path, written = store.put("src/a.py", text_digest("v1"), "# doc v1")
+    assert written and open(path, encoding="utf-8").read() == "# doc v1"
+    manifest = os.stat(os.path.join(store.folder, MANIFEST_NAME)).st_mtime_ns
+
+    assert store.put("src/a.py", text_digest("v1"), "# other") == (path, False)
+    assert open(path, encoding="utf-8").read() == "# doc v1"
+    assert os.stat(os.path.join(store.folder, MANIFEST_NAME)).st_mtime_ns == manifest
+
+    # A deleted doc file is rewritten even though the manifest still lists it
+    os.remove(path)
+    assert store.put("src/a.py", text_digest("v1"), "# doc v1") == (path, True)
+
+
+def test_pruning_keeps_retention_and_never_the_current_doc(tmp_path):
+    store = DocStore(str(tmp_path))
+    paths = [store.put("a.py", text_digest(f"v{n}"), f"v{n}")[0] for n in range(DOC_RETENTION + 2)]
+    assert _docs(store) == sorted(os.path.basename(p) for p in paths[-DOC_RETENTION:])
+    entry = store.current("a.py")
+    assert entry["doc"] == os.path.basename(paths[-1]) and len(entry["history"]) == DOC_RETENTION - 1
+
+    # Going back to a version still in history makes it current again without deleting its file
+    path, written = store.put("a.py", text_digest(f"v{DOC_RETENTION}"), "back")
+    assert written and path == paths[DOC_RETENTION] and os.path.exists(path)
+    assert [r["doc"] for r in store.current("a.py")["history"]].count(os.path.basename(path)) == 0
+
+    single = DocStore(str(tmp_path / "single"), retention=1)
+    first, _ = single.put("a.py", text_digest("v1"), "v1")
+    again, written = single.put("a.py", text_digest("v1"), "v1 forced", force=True)
+    assert written and again == first and open(first, encoding="utf-8").read() == "v1 forced"
+    second, _ = single.put("a.py", text_digest("v2"), "v2")
+    assert _docs(single) == [os.path.basename(second)]
+    assert single.current("a.py")["history"] == []
+
+
+def test_put_many_reports_failures_and_records_the_rest(tmp_path):
+    store = DocStore(str(tmp_path))
+    kept, _ = store.put("same.py", text_digest("v1"), "v1")
+    # A directory squatting on b.py's doc name makes that one write fail
+    blocked = f"b_py_{text_digest('b.py')[:8]}_{text_digest('b')[:12]}.md"
+    os.makedirs(os.path.join(store.folder, blocked, "x"))
+    long_path = "/".join(["deeply_nested_folder"] * 15) + "/a.py"
+    results = store.put_many([
+        (long_path, text_digest("a"), "doc a"),
+        ("b.py", text_digest("b"), "doc b"),
+        ("same.py", text_digest("v1"), "ignored"),
+    ], workers=2)
+
+    assert results[0][1:] == (True, None) and open(results[0][0], encoding="utf-8").read() == "doc a"
+    assert len(os.path.basename(results[0][0])) < 128
+    assert results[1][:2] == (None, False) and results[1][2]
+    assert results[2] == (kept, False, None)
+    assert store.documented() == {long_path, "same.py"}
+    assert DocStore(str(tmp_path)).current(long_path)["doc"] == os.path.basename(results[0][0])
+    assert not [f for f in os.listdir(store.folder) if f.endswith(".tmp")]
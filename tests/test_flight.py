@@ -0,0 +1,109 @@
+"""Concurrent identical work runs once; cancelled or finished flights are not reused."""
+import threading
+import time
+
+import pytest
+
+from codedoc import flight
+from codedoc.flight import SingleFlight
+from codedoc.jobs import JobCancelled
+
+
+@pytest.fixture
+def coalesced(monkeypatch):
+    calls = []
+    monkeypatch.setattr(flight, "count", lambda key, amount=1: calls.append(key))
+    return calls
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _start(target):
+    out = {}
+
+    def run():
+        try:
+            out["result"] = target()
+        except BaseException as e:
+            out["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, out
+
+
+def test_followers_share_the_leaders_run(coalesced):
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return ["shared"]
+
+    leader = _start(lambda: flights.do("k", work))
+    started.wait(5)
+    followers = [_start(lambda: flights.do("k", work)) for _ in range(3)]
+    _wait_for(lambda: len(coalesced) == 3)
+    release.set()
+    for thread, _ in [leader] + followers:
+        thread.join(5)
+
+    results = [out["result"] for _, out in [leader] + followers]
+    assert runs == [1] and coalesced == ["coalesced_calls"] * 3
+    assert all(r is results[0] for r in results)
+
+
+def test_leader_errors_reach_followers(coalesced):
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    leader = _start(lambda: flights.do("k", fail))
+    started.wait(5)
+    follower = _start(lambda: flights.do("k", lambda: "unused"))
+    _wait_for(lambda: coalesced)
+    release.set()
+    for thread, _ in (leader, follower):
+        thread.join(5)
+    assert isinstance(leader[1]["error"], ValueError)
+    assert follower[1]["error"] is leader[1]["error"]
+
+
+def test_follower_reruns_after_a_cancelled_leader(coalesced):
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def cancelled():
+        started.set()
+        release.wait(5)
+        raise JobCancelled()
+
+    leader = _start(lambda: flights.do("k", cancelled))
+    started.wait(5)
+    follower = _start(lambda: flights.do("k", lambda: "own run"))
+    _wait_for(lambda: coalesced)
+    release.set()
+    for thread, _ in (leader, follower):
+        thread.join(5)
+    assert isinstance(leader[1]["error"], JobCancelled)
+    assert follower[1] == {"result": "own run"}
+
+
+def test_finished_results_are_not_reused(coalesced):
+    flights = SingleFlight()
+    runs = []
+    assert flights.do("k", lambda: runs.append(1) or len(runs)) == 1
+    assert flights.do("k", lambda: runs.append(1) or len(runs)) == 2
+    assert coalesced == []
@@ -0,0 +1,78 @@
+"""The project index must list exactly what git treats as untracked and not ignored."""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from codedoc.index import ProjectIndex
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+IGNORE_FILES = {
+    ".gitignore": "\n".join([
+        "# root rules",
+        "*.log",
+        "!keep.log",
+        "/anchored/",
+        "cache/",
+        "**/generated",
+        "docs/**/*.tmp",
+        "sub/deeper/notes.md",
+        "",
+    ]),
+    "sub/.gitignore": "*.txt\n!important.txt\n/local.py\n",
+    "sub2/.gitignore": "!*.log\n",
+}
+
+FILES = [
+    "a.py", "x.log", "keep.log",
+    "sub/y.log", "sub/keep.log", "sub/a.txt", "sub/important.txt", "sub/local.py",
+    "sub/deeper/local.py", "sub/deeper/b.txt", "sub/deeper/notes.md", "sub/deeper/other.md",
+    "sub2/z.log",
+    "anchored/f.py", "sub/anchored/f.py",
+    "cache/f.py", "sub/cache/f.py", "other/cache",
+    "generated", "deep/er/generated/x.py", "deep/er/kept.py",
+    "docs/a.tmp", "docs/x/y/b.tmp", "docs/c.txt",
+]
+
+
+def _write(root, rel, text=""):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def _git_listing(root) -> set:
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    out = subprocess.run(["git", "-c", "core.excludesFile=/dev/null", "ls-files", "--others", "--exclude-standard"],
+                         cwd=root, check=True, capture_output=True, text=True).stdout
+    return set(out.splitlines())
+
+
+def _index_listing(index) -> set:
+    return {p.replace(os.sep, "/") for p in index.files()}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    for rel, text in IGNORE_FILES.items():
+        _write(tmp_path, rel, text)
+    for rel in FILES:
+        _write(tmp_path, rel, "x = 1\n")
+    return tmp_path
+
+
+def test_index_matches_git(repo):
+    expected = _git_listing(repo)
+    assert "keep.log" in expected and "sub2/z.log" in expected  # the tree exercises negation
+    assert _index_listing(ProjectIndex(str(repo))) == expected
+
+
+def test_index_follows_ignore_file_edits(repo):
+    index = ProjectIndex(str(repo))
+    assert _index_listing(index) == _git_listing(repo)
+
+    _write(repo, "sub/.gitignore", "*.md\n!other.md\n")
+    index.refresh(force=True)
+    assert _index_listing(index) == _git_listing(repo)
@@ -0,0 +1,41 @@
+"""File resolution: exact paths win, then folder suffixes, then case-folded names."""
+import os
+
+import pytest
+
+from codedoc.index import ProjectIndex
+
+FILES = ["src/api/client.py", "legacy/src/api/client.py", "web/Client.ts", "web/api/client.ts", "README.md"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    for rel in FILES:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x = 1\n")
+    return ProjectIndex(str(tmp_path))
+
+
+def _resolve(index, file_path):
+    return [p.replace(os.sep, "/") for p in index.resolve(file_path)]
+
+
+def test_exact_path_is_not_ambiguous(index):
+    assert _resolve(index, "src/api/client.py") == ["src/api/client.py"]
+    assert _resolve(index, "./src/api/client.py") == ["src/api/client.py"]
+    assert _resolve(index, os.path.join(index.root, "src", "api", "client.py")) == ["src/api/client.py"]
+    assert _resolve(index, "legacy/src/api/client.py") == ["legacy/src/api/client.py"]
+
+
+def test_folder_suffix_narrows_and_ambiguity_is_reported(index):
+    assert _resolve(index, "client.py") == ["legacy/src/api/client.py", "src/api/client.py"]
+    assert _resolve(index, "api/client.py") == ["legacy/src/api/client.py", "src/api/client.py"]
+    assert _resolve(index, "api/client.ts") == ["web/api/client.ts"]
+    assert _resolve(index, "missing.py") == []
+
+
+def test_names_match_case_insensitively(index):
+    assert _resolve(index, "readme.MD") == ["README.md"]
+    assert _resolve(index, "CLIENT.TS") == ["web/Client.ts", "web/api/client.ts"]
+    assert _resolve(index, "Web/API/Client.ts") == ["web/api/client.ts"]
@@ -0,0 +1,78 @@
+"""Paginated result sets expire, stay bounded and only page for the tool that made them."""
+import types
+
+import pytest
+
+from codedoc import results
+from codedoc.results import (ResultStore, check_offset, check_page_size, make_cursor, page_footer,
+                             parse_cursor)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(results, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_sets_expire_after_the_ttl(clock):
+    store = ResultStore(ttl=60)
+    result_id = store.put(("impact", "/repo", "fetch"), [("a.py", 1)])
+    clock[0] += 60
+    assert store.get(result_id) == (("impact", "/repo", "fetch"), [("a.py", 1)])
+    clock[0] += 1
+    assert store.get(result_id) is None
+    # The expired set no longer blocks its key
+    assert store.get(store.put(("impact", "/repo", "fetch"), [])) is not None
+
+
+def test_least_recently_used_set_is_evicted():
+    store = ResultStore(max_sets=2)
+    first = store.put(("impact", "a"), [1])
+    second = store.put(("impact", "b"), [2])
+    store.get(first)
+    third = store.put(("impact", "c"), [3])
+    assert store.get(second) is None
+    assert store.get(first) == (("impact", "a"), [1])
+    assert store.get(third) == (("impact", "c"), [3])
+
+
+def test_one_live_id_per_key():
+    store = ResultStore()
+    old = store.put(("audit", "/repo"), [1])
+    new = store.put(("audit", "/repo"), [1, 2])
+    assert old != new
+    assert store.get(old) is None
+    assert store.get(new) == (("audit", "/repo"), [1, 2])
+
+
+def test_cursors_from_other_tools_are_rejected():
+    store = ResultStore()
+    result_id = store.put(("audit", "/repo"), [1])
+    with pytest.raises(ValueError):
+        store.get(result_id, kinds=("impact", "blast-radius"))
+    assert store.get(result_id, kinds=("audit",)) == (("audit", "/repo"), [1])
+    assert store.get("r999", kinds=("impact",)) is None
+
+
+def test_cursor_round_trip_and_validation():
+    assert parse_cursor(make_cursor("r7", 20)) == ("r7", 20)
+    for bad in ("", "r7", "r7:", ":5", "r7:-1", "r7:x"):
+        with pytest.raises(ValueError):
+            parse_cursor(bad)
+
+    check_offset(0, 0)  # first page of an empty result
+    check_offset(9, 10)
+    with pytest.raises(ValueError):
+        check_offset(10, 10)
+
+    check_page_size(1)
+    for size in (0, -3):
+        with pytest.raises(ValueError):
+            check_page_size(size)
+
+
+def test_page_footer_links_the_next_page_only():
+    assert page_footer("r1", 0, 5, 12, "files") == (
+        '*Showing files 1-5 of 12.* Next page: call again with `cursor="r1:5"`.')
+    assert page_footer("r1", 10, 5, 12, "files") == "*Showing files 11-12 of 12.*"
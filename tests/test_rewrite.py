@@ -0,0 +1,78 @@
+"""Line patching agrees with the token index, and the journal restores only what it wrote."""
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from codedoc import rewrite
+from codedoc.rewrite import CommitFailed, Transaction, patch_lines, recover
+from codedoc.symbols import tokenize
+
+
+@pytest.mark.parametrize("odd", ["\x0c", "\u2028", "\x85", "\r"], ids=["formfeed", "u2028", "nel", "bare-cr"])
+def test_patch_lines_uses_index_line_numbers(tmp_path, odd):
+    path = tmp_path / "m.py"
+    text = f"x = 1\r\ns = 'a{odd}b'\r\nfoo(1)\nfoo(2)\n"
+    path.write_bytes(text.encode("utf-8"))
+    lines = tokenize(text)["foo"]
+    new_text, changed = patch_lines(str(path), lines, lambda line: line.replace("foo", "bar"))
+    assert changed == list(lines)
+    assert new_text == text.replace("foo", "bar")
+
+
+def _crashed_batch(root, monkeypatch, files):
+    """Commits ``files`` but leaves the journal behind, as if the process died before discarding it."""
+    for rel, (old, _) in files.items():
+        (root / rel).write_text(old)
+    txn = Transaction(str(root))
+    for rel, (_, new) in files.items():
+        txn.stage(rel, new)
+    monkeypatch.setattr(rewrite, "_discard", lambda manifest: None)
+    txn.commit()
+    monkeypatch.undo()
+    manifest = root / ".codedoc" / "journal" / f"{txn.id}.json"
+    data = json.loads(manifest.read_text())
+    data["pid"] = 0  # no live owner
+    manifest.write_text(json.dumps(data))
+    return manifest
+
+
+def test_recover_keeps_files_edited_after_the_crash(tmp_path, monkeypatch):
+    manifest = _crashed_batch(tmp_path, monkeypatch, {"a.py": ("foo()\n", "bar()\n"), "b.py": ("foo()\n", "bar()\n")})
+    (tmp_path / "b.py").write_text("bar()\nuser_edit()\n")
+
+    restored, kept = recover(str(tmp_path))
+    assert (restored, kept) == (["a.py"], ["b.py"])
+    assert (tmp_path / "a.py").read_text() == "foo()\n"
+    assert (tmp_path / "b.py").read_text() == "bar()\nuser_edit()\n"
+    assert not manifest.exists()
+    assert recover(str(tmp_path)) == ([], [])  # once per project and process
+
+
+def test_failed_commit_restores_written_files(tmp_path):
+    (tmp_path / "a.py").write_text("foo()\n")
+    (tmp_path / "b.py").write_text("foo()\n")
+    txn = Transaction(str(tmp_path))
+    txn.stage("a.py", "bar()\n")
+    txn.stage("b.py", "bar()\n", (1, 1))  # stale stat: b.py "changed on disk"
+    with pytest.raises(CommitFailed) as failure:
+        txn.commit()
+    assert failure.value.restored == ["a.py"]
+    assert (tmp_path / "a.py").read_text() == "foo()\n"
+    assert os.listdir(tmp_path / ".codedoc" / "journal") == []
+
+
+def test_recover_leaves_live_transactions_alone(tmp_path, monkeypatch):
+    (tmp_path / "a.py").write_text("foo()\n")
+    write = Transaction._write
+    monkeypatch.setattr(Transaction, "_write", lambda self, rel: (time.sleep(0.3), write(self, rel)))
+    txn = Transaction(str(tmp_path))
+    txn.stage("a.py", "bar()\n")
+    worker = threading.Thread(target=txn.commit)
+    worker.start()
+    time.sleep(0.1)
+    assert recover(str(tmp_path)) == ([], [])
+    worker.join()
+    assert (tmp_path / "a.py").read_text() == "bar()\n"
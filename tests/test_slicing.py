@@ -0,0 +1,45 @@
+"""Unit line numbers survive quotes that are not closed on their line; budgets keep module code."""
+from codedoc.slicing import CHARS_PER_TOKEN, brace_units, build_slice
+
+SOURCE = """function App() {
+  return <p>Don't</p>;
+}
+const r = /'/g;
+class Other {
+  run() { return "x"; }
+}
+"""
+
+
+def test_unclosed_quotes_keep_line_numbers():
+    units = {u.name: (u.start, u.end) for u in brace_units(SOURCE)}
+    assert units == {"App": (1, 3), "Other": (5, 7), "Other.run": (6, 6)}
+
+
+MODULE = """import os
+
+CONFIG = {"retries": 3, "path": os.sep}
+
+
+def f(x):
+    return x * CONFIG["retries"]
+
+
+if __name__ == "__main__":
+    print(f(2))
+"""
+
+
+def test_budget_alone_sends_a_file_that_fits_whole():
+    assert build_slice("m.py", MODULE, max_tokens=len(MODULE)) == MODULE
+
+
+def test_budget_alone_keeps_module_code_as_units():
+    sliced = build_slice("m.py", MODULE, max_tokens=len(MODULE) // CHARS_PER_TOKEN - 1)
+    assert "# L1-3: top-level module code\nimport os\n\nCONFIG" in sliced
+    assert "# L6-7: def f" in sliced
+    assert "# L10-11: top-level module code\nif __name__" in sliced
+
+    tight = build_slice("m.py", MODULE, max_tokens=60 // CHARS_PER_TOKEN)
+    assert "import os" in tight and "def f" not in tight.split("SELECTED CODE:")[1]
+    assert tight.endswith("(Omitted to fit max_tokens: f (L6-7), module code (L10-11))")
@@ -0,0 +1,56 @@
+"""The token index persists across restarts and follows folder-level changes."""
+import os
+import time
+
+from codedoc import symbols
+from codedoc.symbols import TokenIndex
+
+
+def _index(root):
+    index = TokenIndex(str(root), sync_interval=0, full_sync_interval=3600)
+    index.project.refresh_interval = 0
+    return index
+
+
+def test_postings_survive_a_restart_without_rereading(tmp_path, monkeypatch):
+    (tmp_path / "a.py").write_text("def fetch():\n    pass\n\nfetch()\n")
+    assert _index(tmp_path).lookup("fetch") == [("a.py", 1), ("a.py", 4)]
+
+    monkeypatch.setattr(symbols, "read_text", lambda path: (_ for _ in ()).throw(AssertionError(path)))
+    assert _index(tmp_path).lookup("fetch") == [("a.py", 1), ("a.py", 4)]
+
+
+def test_folder_changes_are_picked_up_without_a_full_sweep(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text("fetch()\n")
+    index = _index(tmp_path)
+    assert index.lookup("fetch") == [(os.path.join("pkg", "a.py"), 1)]
+
+    time.sleep(0.05)
+    (tmp_path / "pkg" / "b.py").write_text("x = 1\nfetch()\n")
+    replacement = tmp_path / "pkg" / "a.tmp"
+    replacement.write_text("\nfetch()\n")
+    os.replace(replacement, tmp_path / "pkg" / "a.py")  # atomic save, as editors and apply_sync do
+    assert index.lookup("fetch") == [(os.path.join("pkg", "a.py"), 2), (os.path.join("pkg", "b.py"), 2)]
+
+    # An in-place edit leaves the folder untouched: it is seen by the next full (or forced) sync
+    (tmp_path / "pkg" / "b.py").write_text("fetch()\n\n\n")
+    index.sync(force=True)
+    assert index.lookup("fetch") == [(os.path.join("pkg", "a.py"), 2), (os.path.join("pkg", "b.py"), 1)]
+
+
+def test_text_queries_match_identifiers_cut_at_the_edges(tmp_path):
+    (tmp_path / "a.py").write_text('api_key = "abcdefghijklmnop"\nprefetch(1)\n')
+    index = _index(tmp_path)
+    assert index.find('api_key = "abc') == [("a.py", 1)]
+    assert index.find("fetch(") == [("a.py", 2)]
+
+
+def test_find_many_equals_find_per_query(tmp_path):
+    (tmp_path / "a.py").write_text("import api\n\napi.fetch(1)\nprefetch(2)\nfetch(3)\n")
+    (tmp_path / "b.ts").write_text("const r = api.fetch(x);\nfunction fetch() {}\n// fetch( in a comment\n")
+    (tmp_path / "c.py").write_text("x = 1\n")
+    index = _index(tmp_path)
+    queries = ["fetch", "fetch(", "api.fetch(", "api", "prefetch", "x = 1", "missing", "fetch("]
+    assert index.find_many(queries) == {q: index.find(q) for q in queries}
+    assert index.find_many(["api.fetch("])["api.fetch("] == [("a.py", 3), ("b.ts", 1)]